@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+
+from .models import Entry, DetailedEntry
+
+DEFAULT_WINDOW = 10
+MAX_WINDOW = 1000
+ALLOWED_DAYS = (30, 90, 365)
+
+# (field suffix, display name, icon) for every DetailedEntry category
+CATEGORIES = [
+    ('education', 'Education', '🎓'),
+    ('entertainment', 'Entertainment', '🎬'),
+    ('housing', 'Housing', '🏠'),
+    ('transport', 'Transport', '🚗'),
+    ('food', 'Food', '🍽'),
+    ('utilities', 'Utilities', '⚡'),
+    ('others', 'Others', '📦'),
+]
+
+
+# Read ?days=30|90|365 or ?window=N from the query string. Anything missing
+# or invalid falls back to the last DEFAULT_WINDOW entries.
+def parse_window(request):
+    try:
+        days = int(request.GET.get('days', 0))
+        if days in ALLOWED_DAYS:
+            return {'days': days}
+        last = int(request.GET.get('window', DEFAULT_WINDOW))
+        if last > 0:
+            return {'last': min(last, MAX_WINDOW)}
+    except ValueError:
+        pass
+    return {'last': DEFAULT_WINDOW}
+
+
+def _window_stages(user_id, window):
+    match = {'user_id': user_id}
+    if 'days' in window:
+        match['date'] = {'$gte': datetime.now() - timedelta(days=window['days'])}
+    stages = [{'$match': match}, {'$sort': {'date': -1}}]
+    if 'last' in window:
+        stages.append({'$limit': window['last']})
+    return stages
+
+
+def sum_fields(fields):
+    return {'$add': [{'$ifNull': [f'${field}', 0]} for field in fields]}
+
+
+# Totals and the newest-first rows of a user's Entry window, in one query.
+def entry_summary(user_id, window):
+    pipeline = _window_stages(user_id, window) + [
+        {'$facet': {
+            'totals': [{'$group': {
+                '_id': None,
+                'count': {'$sum': 1},
+                'salary': {'$sum': '$salary'},
+                'budget': {'$sum': '$budget'},
+                'expenses': {'$sum': '$expenses'},
+            }}],
+            'rows': [{'$project': {
+                '_id': 0,
+                'date': 1,
+                'label': {'$dateToString': {'format': '%m/%d', 'date': '$date'}},
+                'salary': {'$toDouble': '$salary'},
+                'budget': {'$toDouble': '$budget'},
+                'expenses': {'$toDouble': '$expenses'},
+            }}],
+        }},
+    ]
+    result = next(Entry._get_collection().aggregate(pipeline))
+    totals = result['totals'][0] if result['totals'] else {}
+    return {
+        'count': totals.get('count', 0),
+        'total_salary': float(totals.get('salary', 0)),
+        'total_budget': float(totals.get('budget', 0)),
+        'total_expenses': float(totals.get('expenses', 0)),
+        'rows': result['rows'],
+    }
+
+
+# Totals, per-category sums and timeline rows of a DetailedEntry window.
+def detailed_summary(user_id, window):
+    budget_fields = [f'budget_{key}' for key, _, _ in CATEGORIES]
+    expense_fields = [f'expense_{key}' for key, _, _ in CATEGORIES]
+
+    group = {'_id': None, 'count': {'$sum': 1}, 'salary': {'$sum': '$salary'}}
+    for field in budget_fields + expense_fields:
+        group[field] = {'$sum': f'${field}'}
+
+    pipeline = _window_stages(user_id, window) + [
+        {'$addFields': {
+            'total_budget': sum_fields(budget_fields),
+            'total_expenses': sum_fields(expense_fields),
+        }},
+        {'$facet': {
+            'totals': [{'$group': {
+                **group,
+                'total_budget': {'$sum': '$total_budget'},
+                'total_expenses': {'$sum': '$total_expenses'},
+            }}],
+            'rows': [{'$project': {
+                '_id': 0,
+                'date': 1,
+                'label': {'$dateToString': {'format': '%m/%d', 'date': '$date'}},
+                'salary': {'$toDouble': '$salary'},
+                'total_budget': {'$toDouble': '$total_budget'},
+                'total_expenses': {'$toDouble': '$total_expenses'},
+                **{field: {'$toDouble': f'${field}'} for field in budget_fields + expense_fields},
+            }}],
+        }},
+    ]
+    result = next(DetailedEntry._get_collection().aggregate(pipeline))
+    totals = result['totals'][0] if result['totals'] else {}
+    categories = [
+        {
+            'name': name,
+            'budget': float(totals.get(f'budget_{key}', 0)),
+            'expense': float(totals.get(f'expense_{key}', 0)),
+            'icon': icon,
+        }
+        for key, name, icon in CATEGORIES
+    ]
+    return {
+        'count': totals.get('count', 0),
+        'total_salary': float(totals.get('salary', 0)),
+        'total_budget': float(totals.get('total_budget', 0)),
+        'total_expenses': float(totals.get('total_expenses', 0)),
+        'categories': categories,
+        'rows': result['rows'],
+    }
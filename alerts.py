@@ -0,0 +1,211 @@
+# Smart-alert rule engine for the finance dashboard. Each rule is a function
+# of one snapshot dict and returns an alert dict or None; rules run in the
+# order they are registered, which is the order alerts are shown in.
+#
+# Snapshot keys: rows (newest first, each with budget/expenses), entry_count
+# (all-time entries), total_budget, total_expenses, avg_budget, avg_expenses.
+RULES = []
+
+
+def rule(func):
+    RULES.append(func)
+    return func
+
+
+def build_snapshot(summary, entry_count=None):
+    rows = summary['rows']
+    budgets = [row['budget'] for row in rows]
+    expenses = [row['expenses'] for row in rows]
+    return {
+        'rows': rows,
+        'entry_count': summary['count'] if entry_count is None else entry_count,
+        'total_budget': summary['total_budget'],
+        'total_expenses': summary['total_expenses'],
+        'avg_budget': sum(budgets) / len(budgets) if budgets else 0,
+        'avg_expenses': sum(expenses) / len(expenses) if expenses else 0,
+    }
+
+
+def evaluate(snapshot):
+    if not snapshot['rows']:
+        return [welcome_alert()]
+    alerts = []
+    for check in RULES:
+        alert = check(snapshot)
+        if alert:
+            alerts.append(alert)
+    return alerts
+
+
+def welcome_alert():
+    return {
+        'type': 'info',
+        'icon': '🎯',
+        'title': 'Welcome to Your Finance Tracker!',
+        'message': 'Start your financial journey by adding your first entry',
+        'action': 'Click "Add Entry" to begin tracking your budget and expenses.'
+    }
+
+
+def _expense_ratio(snapshot):
+    if snapshot['avg_budget'] > 0 and snapshot['avg_expenses'] > 0:
+        return (snapshot['avg_expenses'] / snapshot['avg_budget']) * 100
+    return None
+
+
+@rule
+def budget_exceeded(snapshot):
+    total_budget = snapshot['total_budget']
+    total_expenses = snapshot['total_expenses']
+    if total_expenses > total_budget:
+        overspend_amount = total_expenses - total_budget
+        overspend_percentage = (overspend_amount / total_budget * 100) if total_budget > 0 else 0
+        return {
+            'type': 'danger',
+            'icon': '🚨',
+            'title': 'Budget Exceeded!',
+            'message': f'You\'ve overspent by ${overspend_amount:.2f} ({overspend_percentage:.1f}% over budget)',
+            'action': 'Review your recent expenses and consider adjusting your spending habits.'
+        }
+
+
+@rule
+def expense_trend(snapshot):
+    rows = snapshot['rows']
+    if len(rows) < 3:
+        return None
+    trend = rows[0]['expenses'] - rows[2]['expenses']
+    if trend > 0:
+        return {
+            'type': 'warning',
+            'icon': '📈',
+            'title': 'Rising Expenses Trend',
+            'message': f'Your expenses have increased by ${trend:.2f} in recent entries',
+            'action': 'Consider reviewing your spending categories to identify areas for reduction.'
+        }
+    if trend < -50:  # Significant decrease
+        return {
+            'type': 'success',
+            'icon': '📉',
+            'title': 'Great Progress!',
+            'message': f'You\'ve reduced expenses by ${abs(trend):.2f} recently',
+            'action': 'Keep up the excellent financial discipline!'
+        }
+
+
+@rule
+def expense_ratio(snapshot):
+    ratio = _expense_ratio(snapshot)
+    if len(snapshot['rows']) < 3 or ratio is None:
+        return None
+    if ratio > 90:
+        return {
+            'type': 'warning',
+            'icon': '⚠',
+            'title': 'High Expense Ratio',
+            'message': f'You\'re using {ratio:.1f}% of your budget on average',
+            'action': 'Consider increasing your budget or finding ways to reduce expenses.'
+        }
+    if ratio < 70:
+        return {
+            'type': 'info',
+            'icon': '💡',
+            'title': 'Budget Opportunity',
+            'message': f'You\'re only using {ratio:.1f}% of your budget',
+            'action': 'Great job! Consider saving the extra or investing in your future.'
+        }
+
+
+@rule
+def savings_potential(snapshot):
+    total_budget = snapshot['total_budget']
+    total_expenses = snapshot['total_expenses']
+    if total_budget > total_expenses and total_budget > 0:
+        savings_amount = total_budget - total_expenses
+        savings_percentage = (savings_amount / total_budget) * 100
+        if savings_percentage > 20:
+            return {
+                'type': 'success',
+                'icon': '💰',
+                'title': 'Excellent Savings!',
+                'message': f'You\'ve saved ${savings_amount:.2f} ({savings_percentage:.1f}% of budget)',
+                'action': 'Consider investing these savings or building an emergency fund.'
+            }
+
+
+@rule
+def low_budget(snapshot):
+    if snapshot['avg_budget'] < snapshot['avg_expenses'] * 0.8:
+        return {
+            'type': 'info',
+            'icon': '📊',
+            'title': 'Budget Review Needed',
+            'message': 'Your budget might be too low for your spending patterns',
+            'action': 'Consider reviewing and adjusting your budget to be more realistic.'
+        }
+
+
+@rule
+def spending_spike(snapshot):
+    rows = snapshot['rows']
+    if len(rows) < 5:
+        return None
+    latest_expense = rows[0]['expenses']
+    avg_previous_4 = sum(row['expenses'] for row in rows[1:5]) / 4
+    if latest_expense > avg_previous_4 * 1.5:  # 50% spike
+        spike_amount = latest_expense - avg_previous_4
+        return {
+            'type': 'warning',
+            'icon': '📊',
+            'title': 'Spending Spike Detected',
+            'message': f'Your latest expense (${latest_expense:.2f}) is ${spike_amount:.2f} higher than your recent average',
+            'action': 'Review what caused this increase and consider if it was planned or if you need to adjust future spending.'
+        }
+
+
+@rule
+def consistent_saver(snapshot):
+    rows = snapshot['rows']
+    if len(rows) >= 4 and all(row['budget'] > row['expenses'] for row in rows[:4]):
+        return {
+            'type': 'success',
+            'icon': '🌟',
+            'title': 'Consistent Saver!',
+            'message': 'You\'ve stayed under budget for your last 4 entries',
+            'action': 'Amazing discipline! Consider setting up automatic savings for your surplus.'
+        }
+
+
+@rule
+def tracking_milestone(snapshot):
+    if snapshot['entry_count'] >= 10:
+        return {
+            'type': 'info',
+            'icon': '🏆',
+            'title': 'Tracking Milestone',
+            'message': f'You\'ve made {snapshot["entry_count"]} financial entries - great commitment to tracking!',
+            'action': 'Consider reviewing your long-term trends and setting new financial goals.'
+        }
+
+
+@rule
+def smart_tip(snapshot):
+    ratio = _expense_ratio(snapshot)
+    if len(snapshot['rows']) < 3 or ratio is None:
+        return None
+    if 80 <= ratio <= 90:
+        return {
+            'type': 'info',
+            'icon': '💡',
+            'title': 'Smart Tip: Emergency Fund',
+            'message': f'You\'re using {ratio:.1f}% of your budget consistently',
+            'action': 'Consider building an emergency fund with your remaining 10-20% budget surplus.'
+        }
+    if ratio < 60:
+        return {
+            'type': 'success',
+            'icon': '💡',
+            'title': 'Smart Tip: Investment Opportunity',
+            'message': f'You\'re only using {ratio:.1f}% of your budget',
+            'action': 'Great savings rate! Consider investing the surplus in index funds or retirement accounts.'
+        }
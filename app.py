@@ -1,52 +1,358 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, g, request, jsonify, render_template, Response, make_response, stream_with_context
 from flask_cors import CORS
-from pymongo import MongoClient
+from pymongo import DeleteMany, UpdateOne
+from pymongo.errors import BulkWriteError
 from bson.objectid import ObjectId
+from cache import CardCache
+from cards import (
+    DEFAULT_DECK_ID, DEFAULT_USER_ID, MAX_PAGE_SIZE, MAX_QUIZ_COUNT, answer_result, build_flashcard,
+    grade_answer, missing_user, mistake_page, mistake_page_pipeline, parse_fields, parse_mistake_page,
+    parse_positive_int, serialize_flashcard, user_from_headers
+)
+from db import LazyCollection
+from indexes import ensure_indexes
+from matching import compile_answers
+import metrics
+from search import UserSearchIndexes
+from scheduler import new_review_state, next_review_state, quality_for, serialize_review_state, utcnow
+from versions import bump_version, changes_since, current_version, version_info
+from datetime import timezone
+import click
+import csv
+import functools
+import gzip
+import hashlib
+import io
+import json
+import os
 import random
+import threading
 
 app = Flask(__name__)
 CORS(app)
+metrics.init_app(app)
 
-client = MongoClient("mongodb://localhost:27017")
-db = client.flashfocus
+# Collections resolve through db.py on first use, so each worker process
+# builds its own pooled client after fork.
+flashcards_col = LazyCollection("flashcards")
+mistakes_col = LazyCollection("mistakes")
+reviews_col = LazyCollection("reviews")
 
-flashcards_col = db.flashcards
-mistakes_col = db.mistakes
+MAX_REVIEW_BATCH = 100
+MAX_ANSWER_BATCH = 500
+MAX_SEARCH_RESULTS = 100
+BULK_BATCH_SIZE = 1000
+GZIP_MIN_SIZE = 1024
 
-def serialize_flashcard(doc):
-    return {
-        "_id": str(doc["_id"]),
-        "question": doc["question"],
-        "answer": doc["answer"],
-        "hint": doc.get("hint", ""),
-        "difficulty": doc.get("difficulty", "")
-    }
+# Set FLASHFOCUS_CACHE_COHERENCE=1 when running several workers so each one
+# notices deck writes made by the others.
+card_cache = CardCache(
+    maxsize=int(os.environ.get("FLASHFOCUS_CACHE_SIZE", 10000)),
+    ttl=float(os.environ.get("FLASHFOCUS_CACHE_TTL", 300)),
+    version_source=(lambda user: current_version(f"flashcards:{user}")) if os.environ.get("FLASHFOCUS_CACHE_COHERENCE") == "1" else None,
+    check_interval=float(os.environ.get("FLASHFOCUS_CACHE_CHECK_INTERVAL", 1.0))
+)
+# The search index always tracks the deck version, whatever the cache
+# coherence setting: it has no TTL, so without it writes made by other
+# workers would never become searchable here. Local writes apply in place
+# (bump_version returns the new version); other workers' writes are noticed
+# within check_interval and only the cards named in the version's change log
+# are re-read. A full rebuild is left for when the log has been trimmed past
+# the index's version.
+SEARCH_FIELDS = {"question": 1, "answer": 1, "hint": 1}
+search_indexes = UserSearchIndexes(
+    loader=lambda user: flashcards_col.find({"user_id": user}, SEARCH_FIELDS),
+    version_source=lambda user: current_version(f"flashcards:{user}"),
+    check_interval=card_cache.check_interval,
+    change_source=lambda user, version: changes_since(f"flashcards:{user}", version),
+    card_loader=lambda user, ids: flashcards_col.find({"_id": {"$in": ids}, "user_id": user}, SEARCH_FIELDS)
+)
+
+# Indexes are ensured once per worker process, on its first request, so
+# `flask run`, gunicorn and any other WSGI server get them without a
+# separate step. A failure (e.g. no createIndex privilege) is logged and the
+# app keeps serving; `flask ensure-indexes` can be run by hand instead. Set
+# FLASHFOCUS_ENSURE_INDEXES=0 to skip it.
+index_state = {"done": os.environ.get("FLASHFOCUS_ENSURE_INDEXES", "1") == "0", "lock": threading.Lock()}
+
+@app.before_request
+def ensure_indexes_once():
+    if index_state["done"]:
+        return
+    with index_state["lock"]:
+        if index_state["done"]:
+            return
+        try:
+            ensure_indexes()
+        except Exception:
+            app.logger.exception("Could not ensure indexes; run `flask ensure-indexes`")
+        index_state["done"] = True
+
+@app.before_request
+def require_user():
+    if missing_user(request.path, request.headers):
+        return jsonify({"error": "X-User-Id header required"}), 401
+
+def current_user():
+    return user_from_headers(request.headers)
+
+def scoped_query():
+    query = {"user_id": current_user()}
+    deck = request.args.get("deck", "").strip()
+    if deck:
+        query["deck_id"] = deck
+    return query
+
+def versioned(*names):
+    # Answers conditional GETs from the version counters alone, so an
+    # unchanged collection costs one small meta lookup and no document reads.
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            user = current_user()
+            versions, updated_at = version_info(*[f"{name}:{user}" for name in names])
+            # Counters are per user, so two users can sit at the same version;
+            # the user hash keeps one user's ETag from validating another's
+            # cached response.
+            owner = hashlib.sha256(user.encode()).hexdigest()[:16]
+            etag = owner + "." + ".".join(f"{name}-{version}" for name, version in zip(names, versions))
+            # Views that serve cached bodies must build them from at least
+            # these versions, so the ETag never labels an older body.
+            g.versions = dict(zip(names, versions))
+            if updated_at is not None:
+                updated_at = updated_at.replace(tzinfo=timezone.utc, microsecond=0)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = since is not None and updated_at is not None and since >= updated_at
+
+            if not_modified:
+                resp = Response(status=304)
+            else:
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag, weak=True)
+            if updated_at is not None:
+                resp.last_modified = updated_at
+            resp.headers["Cache-Control"] = "no-cache"
+            resp.vary.add("X-User-Id")
+            return resp
+        return wrapper
+    return decorator
+
+@app.after_request
+def compress_response(resp):
+    if (resp.status_code != 200 or resp.direct_passthrough or resp.is_streamed
+            or "Content-Encoding" in resp.headers
+            or "gzip" not in request.accept_encodings):
+        return resp
+    data = resp.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return resp
+    resp.set_data(gzip.compress(data, compresslevel=6))
+    resp.headers["Content-Encoding"] = "gzip"
+    resp.vary.add("Accept-Encoding")
+    return resp
 
 @app.route("/flashcards", methods=["GET"])
+@versioned("flashcards")
 def get_flashcards():
-    cards = list(flashcards_col.find())
-    return jsonify([serialize_flashcard(c) for c in cards])
+    fields = None
+    projection = None
+    if "fields" in request.args:
+        try:
+            fields = parse_fields(request.args["fields"])
+        except ValueError as e:
+            return jsonify({"error": f"Unknown field: {e}"}), 400
+        projection = {field: 1 for field in fields}
+
+    user = current_user()
+    query = scoped_query()
+    after = request.args.get("after")
+    raw_limit = request.args.get("limit")
+    if after is None and raw_limit is None:
+        if fields is None and "deck_id" not in query:
+            return jsonify(card_cache.get_deck(user, lambda: load_deck(user), version=g.versions["flashcards"]))
+        cards = flashcards_col.find(query, projection)
+        return jsonify([serialize_flashcard(c, fields) for c in cards])
+
+    try:
+        limit = parse_positive_int(raw_limit, MAX_PAGE_SIZE) if raw_limit is not None else MAX_PAGE_SIZE
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    if after:
+        try:
+            query["_id"] = {"$gt": ObjectId(after)}
+        except:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    # Keyset pagination on _id: each page is an index range scan, and one
+    # extra document tells us whether another page exists.
+    cards = list(flashcards_col.find(query, projection).sort("_id", 1).limit(limit + 1))
+    next_cursor = None
+    if len(cards) > limit:
+        cards = cards[:limit]
+        next_cursor = str(cards[-1]["_id"])
+    return jsonify({
+        "items": [serialize_flashcard(c, fields) for c in cards],
+        "next": next_cursor
+    })
+
+def load_deck(user):
+    return [serialize_flashcard(c) for c in flashcards_col.find({"user_id": user})]
+
+def load_cards(user, oids):
+    return {c["_id"]: c for c in flashcards_col.find({"_id": {"$in": oids}, "user_id": user})}
+
+def deck_changed(user, removed=None, added=()):
+    # Invalidate before bumping: a reader that sees the new version must not
+    # still find the old snapshot in the cache.
+    card_cache.invalidate(user, removed)
+    version = bump_version(
+        f"flashcards:{user}", added=[card["_id"] for card in added], removed=[removed] if removed else ()
+    )
+    search_indexes.apply(user, version, added=added, removed=[removed] if removed else ())
+
+def read_ndjson_rows(stream):
+    for line in io.TextIOWrapper(stream, encoding="utf-8"):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+def read_csv_rows(stream):
+    return csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8", newline=""))
+
+def schedule_new_cards(user, cards):
+    now = utcnow()
+    reviews_col.insert_many(
+        [
+            {"user_id": user, "flashcard_id": str(card["_id"]), "deck_id": card["deck_id"], **new_review_state(now)}
+            for card in cards
+        ],
+        ordered=False
+    )
+
+def insert_batch(user, batch, errors):
+    rows = [row for row, _ in batch]
+    cards = [card for _, card in batch]
+    failed = set()
+    try:
+        flashcards_col.insert_many(cards, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            failed.add(err["index"])
+            errors.append({"row": rows[err["index"]], "error": err.get("errmsg", "Write failed")})
+    # insert_many assigns _id on the documents it was given, so the cards
+    # that went through are everything not reported as a write error.
+    inserted = [card for i, card in enumerate(cards) if i not in failed]
+    if inserted:
+        schedule_new_cards(user, inserted)
+        deck_changed(user, added=inserted)
+    return len(inserted)
 
 @app.route("/flashcards", methods=["POST"])
 def add_flashcard():
     data = request.get_json()
-    question = data.get("question", "").strip()
-    answer = data.get("answer", "").strip()
-    hint = data.get("hint", "").strip()
-    difficulty = data.get("difficulty", "").strip()
-
-    if not question or not answer or not difficulty:
-        return jsonify({"error": "Question, answer, and difficulty required"}), 400
-
-    new_card = {
-        "question": question,
-        "answer": answer,
-        "hint": hint,
-        "difficulty": difficulty
-    }
-    res = flashcards_col.insert_one(new_card)
-    new_card["_id"] = str(res.inserted_id)
-    return jsonify(new_card), 201
+    try:
+        new_card = build_flashcard(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    user = current_user()
+    new_card["user_id"] = user
+    flashcards_col.insert_one(new_card)
+    schedule_new_cards(user, [new_card])
+    deck_changed(user, added=[new_card])
+    return jsonify(serialize_flashcard(new_card)), 201
+
+@app.route("/flashcards/bulk", methods=["POST"])
+def bulk_add_flashcards():
+    content_type = request.mimetype
+    if content_type == "text/csv":
+        rows = read_csv_rows(request.stream)
+    elif content_type in ("application/x-ndjson", "application/jsonl", "application/json", ""):
+        rows = read_ndjson_rows(request.stream)
+    else:
+        return jsonify({"error": "Expected an NDJSON or CSV body"}), 415
+
+    user = current_user()
+    inserted = 0
+    errors = []
+    batch = []
+    rows = iter(rows)
+    row_number = 0
+    while True:
+        row_number += 1
+        # Decoding happens lazily as rows are read, so a bad byte or a NUL
+        # surfaces here. Earlier batches are already written; stop and report
+        # the row instead of failing the whole request.
+        try:
+            data = next(rows)
+        except StopIteration:
+            break
+        except (UnicodeDecodeError, csv.Error) as e:
+            errors.append({"row": row_number, "error": f"Unreadable row: {e}"})
+            break
+        try:
+            if data is None:
+                raise ValueError("Invalid JSON")
+            card = build_flashcard(data)
+        except ValueError as e:
+            errors.append({"row": row_number, "error": str(e)})
+            continue
+        card["user_id"] = user
+        batch.append((row_number, card))
+        if len(batch) >= BULK_BATCH_SIZE:
+            inserted += insert_batch(user, batch, errors)
+            batch = []
+    if batch:
+        inserted += insert_batch(user, batch, errors)
+
+    return jsonify({"inserted": inserted, "errors": errors}), 201 if inserted else 400
+
+@app.route("/flashcards/export", methods=["GET"])
+def export_flashcards():
+    query = scoped_query()
+
+    def generate():
+        cursor = flashcards_col.find(query, batch_size=BULK_BATCH_SIZE)
+        try:
+            for card in cursor:
+                yield json.dumps(serialize_flashcard(card)) + "\n"
+        finally:
+            cursor.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=flashcards.ndjson"}
+    )
+
+@app.route("/flashcards/search", methods=["GET"])
+def search_flashcards():
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"error": "q required"}), 400
+    try:
+        limit = parse_positive_int(request.args.get("limit", 20), MAX_SEARCH_RESULTS)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    user = current_user()
+    ranked = search_indexes.search(user, q, limit)
+    cards = card_cache.get_cards(user, [card_id for card_id, _ in ranked], lambda oids: load_cards(user, oids))
+    return jsonify([
+        {**serialize_flashcard(cards[card_id]), "score": round(score, 4)}
+        for card_id, score in ranked if card_id in cards
+    ])
 
 @app.route("/flashcards/<id>", methods=["DELETE"])
 def delete_flashcard(id):
@@ -54,20 +360,65 @@ def delete_flashcard(id):
         oid = ObjectId(id)
     except:
         return jsonify({"error": "Invalid id"}), 400
-    res = flashcards_col.delete_one({"_id": oid})
+    user = current_user()
+    res = flashcards_col.delete_one({"_id": oid, "user_id": user})
     if res.deleted_count == 0:
         return jsonify({"error": "Flashcard not found"}), 404
-    mistakes_col.delete_many({"flashcard_id": id})
+    deck_changed(user, oid)
+    if mistakes_col.delete_many({"user_id": user, "flashcard_id": id}).deleted_count:
+        bump_version(f"mistakes:{user}")
+    reviews_col.delete_many({"user_id": user, "flashcard_id": id})
 
     return jsonify({"message": "Deleted"}), 200
 
 @app.route("/quiz", methods=["GET"])
 def get_quiz():
-    cards = list(flashcards_col.find())
+    user = current_user()
+    query = scoped_query()
+    difficulty = request.args.get("difficulty", "").strip()
+    if difficulty:
+        query["difficulty"] = difficulty
+
+    raw_count = request.args.get("count")
+    try:
+        count = parse_positive_int(raw_count, MAX_QUIZ_COUNT) if raw_count is not None else 1
+    except ValueError:
+        return jsonify({"error": "Invalid count"}), 400
+
+    # A cached deck is sampled in-process. Deck and difficulty filters are a
+    # list scan over it, which still beats the server path below.
+    deck = card_cache.peek_deck(user)
+    if deck is not None:
+        if len(query) > 1:
+            deck = [
+                c for c in deck
+                if c["deck_id"] == query.get("deck_id", c["deck_id"])
+                and c["difficulty"] == query.get("difficulty", c["difficulty"])
+            ]
+        if deck:
+            if raw_count is None:
+                return jsonify(random.choice(deck))
+            return jsonify(random.sample(deck, min(count, len(deck))))
+
+    # Only a $sample that is the very first stage of a pipeline gets mongod's
+    # random-cursor fast path. After a $match (always present here, since
+    # every query is scoped to a user) mongod reads every matching document
+    # and sorts them on a random key. That is O(matched cards) on the server,
+    # though still one round trip and only `count` documents on the wire.
+    pipeline = [{"$match": query}, {"$sample": {"size": count}}]
+
+    cards = []
+    seen = set()
+    for card in flashcards_col.aggregate(pipeline):
+        if card["_id"] not in seen:
+            seen.add(card["_id"])
+            cards.append(card)
+
     if not cards:
         return jsonify({"error": "No flashcards"}), 404
-    card = random.choice(cards)
-    return jsonify(serialize_flashcard(card))
+    if raw_count is None:
+        return jsonify(serialize_flashcard(cards[0]))
+    return jsonify([serialize_flashcard(c) for c in cards])
 
 @app.route("/answer", methods=["POST"])
 def check_answer():
@@ -83,27 +434,233 @@ def check_answer():
     except:
         return jsonify({"error": "Invalid id"}), 400
 
-    card = flashcards_col.find_one({"_id": oid})
+    user = current_user()
+    card = card_cache.get_card(user, oid, lambda: flashcards_col.find_one({"_id": oid, "user_id": user}))
     if not card:
         return jsonify({"error": "Flashcard not found"}), 404
 
-    correct_answer = card["answer"].strip().lower()
+    correct = grade_answer(card, user_answer)
+    record_review(user, card, correct)
 
-    if user_answer == correct_answer:
-        mistakes_col.delete_many({"flashcard_id": id})
-        return jsonify({"correct": True})
+    key = {"user_id": user, "flashcard_id": id}
+    if correct:
+        changed = mistakes_col.delete_many(key).deleted_count
     else:
-        mistakes_col.update_one({"flashcard_id": id}, {"$set": {"flashcard_id": id}}, upsert=True)
-        return jsonify({"correct": False, "correct_answer": card["answer"]})
+        mistakes_col.update_one(key, miss_update(1, utcnow()), upsert=True)
+        changed = True
+    if changed:
+        bump_version(f"mistakes:{user}")
+    return jsonify(answer_result(card, correct))
+
+@app.route("/answers/batch", methods=["POST"])
+def check_answers_batch():
+    data = request.get_json(silent=True)
+    items = data.get("answers") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "answers list required"}), 400
+    if len(items) > MAX_ANSWER_BATCH:
+        return jsonify({"error": f"At most {MAX_ANSWER_BATCH} answers per batch"}), 400
+
+    results = [None] * len(items)
+    pending = []
+    for i, item in enumerate(items):
+        id = item.get("id", "") if isinstance(item, dict) else ""
+        user_answer = item.get("answer", "") if isinstance(item, dict) else ""
+        if not isinstance(id, str) or not isinstance(user_answer, str):
+            id, user_answer = "", ""
+        user_answer = user_answer.strip().lower()
+        if not id or not user_answer:
+            results[i] = {"error": "id and answer required"}
+            continue
+        try:
+            oid = ObjectId(id)
+        except:
+            results[i] = {"error": "Invalid id"}
+            continue
+        pending.append((i, id, oid, user_answer))
+
+    user = current_user()
+    ids = list({id for _, id, _, _ in pending})
+    cards = card_cache.get_cards(user, [ObjectId(id) for id in ids], lambda oids: load_cards(user, oids))
+    states = {
+        r["flashcard_id"]: r
+        for r in reviews_col.find({"user_id": user, "flashcard_id": {"$in": ids}}, {"_id": 0})
+    }
+
+    # Answers are applied in order: a correct answer clears the card's
+    # mistake record, and only misses after the last correct one are counted.
+    # Review state is threaded through every answer.
+    now = utcnow()
+    marks = {}
+    for i, id, oid, user_answer in pending:
+        card = cards.get(oid)
+        if not card:
+            results[i] = {"error": "Flashcard not found"}
+            continue
+        correct = grade_answer(card, user_answer)
+        states[id] = {**next_review_state(states.get(id), quality_for(correct), now), "deck_id": card.get("deck_id", DEFAULT_DECK_ID)}
+        if correct:
+            marks[id] = [True, 0]
+        else:
+            marks.setdefault(id, [False, 0])[1] += 1
+        results[i] = answer_result(card, correct)
+
+    if marks:
+        ops = []
+        for id, (cleared, misses) in marks.items():
+            key = {"user_id": user, "flashcard_id": id}
+            if cleared:
+                ops.append(DeleteMany(key))
+            if misses:
+                ops.append(UpdateOne(key, miss_update(misses, now), upsert=True))
+        res = mistakes_col.bulk_write(ops, ordered=True)
+        if res.deleted_count or res.upserted_count or res.modified_count:
+            bump_version(f"mistakes:{user}")
+        reviews_col.bulk_write([
+            UpdateOne({"user_id": user, "flashcard_id": id}, {"$set": review_fields(states[id])}, upsert=True)
+            for id in marks
+        ], ordered=False)
+
+    return jsonify({"results": results})
+
+def miss_update(misses, now):
+    return {"$inc": {"count": misses}, "$set": {"last_missed": now}}
+
+def review_fields(state):
+    return {key: state[key] for key in ("ease", "interval", "repetitions", "due", "deck_id")}
+
+def record_review(user, card, correct):
+    key = {"user_id": user, "flashcard_id": str(card["_id"])}
+    state = reviews_col.find_one(key, {"_id": 0, "ease": 1, "interval": 1, "repetitions": 1, "due": 1})
+    state = next_review_state(state, quality_for(correct))
+    state["deck_id"] = card.get("deck_id", DEFAULT_DECK_ID)
+    reviews_col.update_one(key, {"$set": state}, upsert=True)
+
+@app.route("/review/due", methods=["GET"])
+def get_due_reviews():
+    try:
+        limit = parse_positive_int(request.args.get("limit", 20), MAX_REVIEW_BATCH)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    # Served from the (user_id, due) index: a range scan over this user's
+    # keys that stops after `limit` matches.
+    query = scoped_query()
+    query["due"] = {"$lte": utcnow()}
+    due = list(
+        reviews_col.find(query, {"_id": 0})
+        .sort("due", 1)
+        .limit(limit)
+    )
+    ids = [ObjectId(r["flashcard_id"]) for r in due]
+    cards = {str(c["_id"]): c for c in flashcards_col.find({"_id": {"$in": ids}, "user_id": query["user_id"]})}
+
+    queue = []
+    for review in due:
+        card = cards.get(review["flashcard_id"])
+        if card:
+            queue.append({**serialize_flashcard(card), "review": serialize_review_state(review)})
+    return jsonify(queue)
 
 @app.route("/mistakes", methods=["GET"])
+@versioned("mistakes")
 def get_mistakes():
-    mistakes = list(mistakes_col.find())
-    mistake_ids = [m["flashcard_id"] for m in mistakes]
-    return jsonify(mistake_ids)
+    user = current_user()
+    if request.args.get("expand") not in ("1", "true"):
+        mistakes = list(mistakes_col.find({"user_id": user}, {"flashcard_id": 1}))
+        mistake_ids = [m["flashcard_id"] for m in mistakes]
+        return jsonify(mistake_ids)
+
+    try:
+        sort, limit, offset = parse_mistake_page(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    rows = list(mistakes_col.aggregate(mistake_page_pipeline(user, sort, limit, offset)))
+    return jsonify(mistake_page(rows, limit, offset))
+
+@app.route("/cache/stats", methods=["GET"])
+def get_cache_stats():
+    return jsonify(card_cache.stats())
+
 @app.route('/')
 def home():
     return render_template("index.html")
 
+@app.cli.command("ensure-indexes")
+def ensure_indexes_command():
+    report = ensure_indexes()
+    for name in report["created"]:
+        print(f"created  {name}")
+    for name in report["redundant"]:
+        print(f"redundant  {name}")
+
+@app.cli.command("backfill-answers")
+@click.option("--all", "recompile", is_flag=True, help="Recompile every card, e.g. after normalization changes.")
+def backfill_answers_command(recompile):
+    # Cards written before answers were precompiled are still graded
+    # correctly, just more slowly; this stores their normalized answers.
+    updated = 0
+    batch = []
+    query = {} if recompile else {"accepted_answers": {"$exists": False}}
+    for card in flashcards_col.find(query, {"answer": 1, "alternates": 1}):
+        accepted = compile_answers(card["answer"], card.get("alternates", []))
+        batch.append(UpdateOne({"_id": card["_id"]}, {"$set": {"accepted_answers": accepted}}))
+        if len(batch) >= BULK_BATCH_SIZE:
+            updated += flashcards_col.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += flashcards_col.bulk_write(batch, ordered=False).modified_count
+    print(f"updated  {updated}")
+
+@app.cli.command("backfill-reviews")
+def backfill_reviews_command():
+    # Only cards created after scheduling was added got a review document,
+    # so older cards never show up in /review/due. Schedule them as new.
+    # Run backfill-owners first: cards without an owner are skipped.
+    inserted = 0
+
+    def schedule(batch):
+        ids = [str(card["_id"]) for card in batch]
+        have = {
+            (r["user_id"], r["flashcard_id"])
+            for r in reviews_col.find({"flashcard_id": {"$in": ids}}, {"_id": 0, "user_id": 1, "flashcard_id": 1})
+        }
+        now = utcnow()
+        missing = [
+            {"user_id": card["user_id"], "flashcard_id": str(card["_id"]),
+             "deck_id": card.get("deck_id", DEFAULT_DECK_ID), **new_review_state(now)}
+            for card in batch if (card["user_id"], str(card["_id"])) not in have
+        ]
+        if missing:
+            reviews_col.insert_many(missing, ordered=False)
+        return len(missing)
+
+    batch = []
+    for card in flashcards_col.find({"user_id": {"$exists": True}}, {"user_id": 1, "deck_id": 1}):
+        batch.append(card)
+        if len(batch) >= BULK_BATCH_SIZE:
+            inserted += schedule(batch)
+            batch = []
+    if batch:
+        inserted += schedule(batch)
+    print(f"scheduled  {inserted}")
+
+@app.cli.command("backfill-owners")
+@click.option("--user", default=DEFAULT_USER_ID, show_default=True, help="Owner for documents without one.")
+def backfill_owners_command(user):
+    # Documents written before decks were per-user belong to nobody; hand
+    # them to one user so the scoped queries can see them again.
+    missing = {"user_id": {"$exists": False}}
+    for name, col, fields in (
+        ("flashcards", flashcards_col, {"user_id": user, "deck_id": DEFAULT_DECK_ID}),
+        ("mistakes", mistakes_col, {"user_id": user}),
+        ("reviews", reviews_col, {"user_id": user, "deck_id": DEFAULT_DECK_ID}),
+    ):
+        res = col.update_many(missing, {"$set": fields})
+        print(f"{name}  {res.modified_count}")
+    for name in ("flashcards", "mistakes"):
+        bump_version(f"{name}:{user}", logged=False)
+    card_cache.clear()
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,228 @@
+# Async serving mode: the core flashcard routes on Quart + Motor, with the
+# same JSON contracts as app.py. Run with e.g.
+#
+#     uvicorn asgi:app --workers 2
+#
+# Connection settings come from the same MONGO_* variables as db.py.
+from bson.objectid import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from quart import Quart, jsonify, request
+from quart_cors import cors
+
+import db
+from cards import (
+    DEFAULT_DECK_ID, MAX_PAGE_SIZE, MAX_QUIZ_COUNT, answer_result, build_flashcard, grade_answer,
+    missing_user, mistake_page, mistake_page_pipeline, parse_fields, parse_mistake_page, parse_positive_int,
+    serialize_flashcard, user_from_headers
+)
+from scheduler import new_review_state, next_review_state, quality_for, utcnow
+from versions import bump_update
+
+app = cors(Quart(__name__))
+mongo = {}
+
+
+@app.before_serving
+async def connect():
+    # Motor clients are bound to the running event loop, so build one per
+    # worker once the loop is up.
+    client = AsyncIOMotorClient(
+        db.get_setting("uri"),
+        maxPoolSize=db.get_setting("max_pool_size"),
+        minPoolSize=db.get_setting("min_pool_size"),
+        serverSelectionTimeoutMS=db.get_setting("server_selection_timeout_ms"),
+        connectTimeoutMS=db.get_setting("connect_timeout_ms"),
+        socketTimeoutMS=db.get_setting("socket_timeout_ms"),
+        readPreference=db.get_setting("read_preference"),
+    )
+    database = client.get_default_database(default=db.get_setting("db_name"))
+    mongo.update(
+        client=client,
+        flashcards=database.flashcards,
+        mistakes=database.mistakes,
+        reviews=database.reviews,
+        meta=database.meta,
+    )
+
+
+@app.after_serving
+async def disconnect():
+    mongo["client"].close()
+
+
+@app.before_request
+async def require_user():
+    if missing_user(request.path, request.headers):
+        return jsonify({"error": "X-User-Id header required"}), 401
+
+
+def scoped_query():
+    query = {"user_id": user_from_headers(request.headers)}
+    deck = request.args.get("deck", "").strip()
+    if deck:
+        query["deck_id"] = deck
+    return query
+
+
+async def bump_version(name, added=(), removed=()):
+    await mongo["meta"].update_one({"_id": name}, bump_update(added, removed), upsert=True)
+
+
+@app.route("/flashcards", methods=["GET"])
+async def get_flashcards():
+    fields = None
+    projection = None
+    if "fields" in request.args:
+        try:
+            fields = parse_fields(request.args["fields"])
+        except ValueError as e:
+            return jsonify({"error": f"Unknown field: {e}"}), 400
+        projection = {field: 1 for field in fields}
+
+    query = scoped_query()
+    after = request.args.get("after")
+    raw_limit = request.args.get("limit")
+    if after is None and raw_limit is None:
+        cards = [serialize_flashcard(c, fields) async for c in mongo["flashcards"].find(query, projection)]
+        return jsonify(cards)
+
+    try:
+        limit = parse_positive_int(raw_limit, MAX_PAGE_SIZE) if raw_limit is not None else MAX_PAGE_SIZE
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    if after:
+        try:
+            query["_id"] = {"$gt": ObjectId(after)}
+        except:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    cards = await mongo["flashcards"].find(query, projection).sort("_id", 1).limit(limit + 1).to_list(None)
+    next_cursor = None
+    if len(cards) > limit:
+        cards = cards[:limit]
+        next_cursor = str(cards[-1]["_id"])
+    return jsonify({
+        "items": [serialize_flashcard(c, fields) for c in cards],
+        "next": next_cursor
+    })
+
+
+@app.route("/flashcards", methods=["POST"])
+async def add_flashcard():
+    data = await request.get_json()
+    try:
+        new_card = build_flashcard(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    user = user_from_headers(request.headers)
+    new_card["user_id"] = user
+    res = await mongo["flashcards"].insert_one(new_card)
+    await mongo["reviews"].insert_one({
+        "user_id": user, "flashcard_id": str(res.inserted_id), "deck_id": new_card["deck_id"], **new_review_state()
+    })
+    await bump_version(f"flashcards:{user}", added=[res.inserted_id])
+    return jsonify(serialize_flashcard(new_card)), 201
+
+
+@app.route("/flashcards/<id>", methods=["DELETE"])
+async def delete_flashcard(id):
+    try:
+        oid = ObjectId(id)
+    except:
+        return jsonify({"error": "Invalid id"}), 400
+    user = user_from_headers(request.headers)
+    res = await mongo["flashcards"].delete_one({"_id": oid, "user_id": user})
+    if res.deleted_count == 0:
+        return jsonify({"error": "Flashcard not found"}), 404
+    await bump_version(f"flashcards:{user}", removed=[oid])
+    key = {"user_id": user, "flashcard_id": id}
+    if (await mongo["mistakes"].delete_many(key)).deleted_count:
+        await bump_version(f"mistakes:{user}")
+    await mongo["reviews"].delete_many(key)
+
+    return jsonify({"message": "Deleted"}), 200
+
+
+@app.route("/quiz", methods=["GET"])
+async def get_quiz():
+    query = scoped_query()
+    difficulty = request.args.get("difficulty", "").strip()
+    if difficulty:
+        query["difficulty"] = difficulty
+
+    raw_count = request.args.get("count")
+    try:
+        count = parse_positive_int(raw_count, MAX_QUIZ_COUNT) if raw_count is not None else 1
+    except ValueError:
+        return jsonify({"error": "Invalid count"}), 400
+
+    pipeline = [{"$match": query}, {"$sample": {"size": count}}]
+
+    cards = []
+    seen = set()
+    async for card in mongo["flashcards"].aggregate(pipeline):
+        if card["_id"] not in seen:
+            seen.add(card["_id"])
+            cards.append(card)
+
+    if not cards:
+        return jsonify({"error": "No flashcards"}), 404
+    if raw_count is None:
+        return jsonify(serialize_flashcard(cards[0]))
+    return jsonify([serialize_flashcard(c) for c in cards])
+
+
+@app.route("/answer", methods=["POST"])
+async def check_answer():
+    data = await request.get_json()
+    id = data.get("id", "")
+    user_answer = data.get("answer", "").strip().lower()
+
+    if not id or not user_answer:
+        return jsonify({"error": "id and answer required"}), 400
+
+    try:
+        oid = ObjectId(id)
+    except:
+        return jsonify({"error": "Invalid id"}), 400
+
+    user = user_from_headers(request.headers)
+    card = await mongo["flashcards"].find_one({"_id": oid, "user_id": user})
+    if not card:
+        return jsonify({"error": "Flashcard not found"}), 404
+
+    correct = grade_answer(card, user_answer)
+    key = {"user_id": user, "flashcard_id": id}
+    state = await mongo["reviews"].find_one(key, {"_id": 0, "ease": 1, "interval": 1, "repetitions": 1, "due": 1})
+    state = next_review_state(state, quality_for(correct))
+    state["deck_id"] = card.get("deck_id", DEFAULT_DECK_ID)
+    await mongo["reviews"].update_one(key, {"$set": state}, upsert=True)
+
+    if correct:
+        changed = (await mongo["mistakes"].delete_many(key)).deleted_count
+    else:
+        await mongo["mistakes"].update_one(
+            key,
+            {"$inc": {"count": 1}, "$set": {"last_missed": utcnow()}},
+            upsert=True
+        )
+        changed = True
+    if changed:
+        await bump_version(f"mistakes:{user}")
+    return jsonify(answer_result(card, correct))
+
+
+@app.route("/mistakes", methods=["GET"])
+async def get_mistakes():
+    user = user_from_headers(request.headers)
+    if request.args.get("expand") not in ("1", "true"):
+        return jsonify([m["flashcard_id"] async for m in mongo["mistakes"].find({"user_id": user}, {"flashcard_id": 1})])
+
+    try:
+        sort, limit, offset = parse_mistake_page(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    rows = await mongo["mistakes"].aggregate(mistake_page_pipeline(user, sort, limit, offset)).to_list(None)
+    return jsonify(mistake_page(rows, limit, offset))
@@ -0,0 +1,279 @@
+"""Latency/throughput benchmark for the flashcard API.
+
+Seeds a deck of each requested size into mongomock or a scratch database on
+a real mongod, then drives every route through the Flask test client and,
+with --http, through a threaded HTTP load generator against a local server.
+
+    python bench/bench_api.py --sizes 1000,100000 --backend mongod --http
+    python bench/bench_api.py --output before.json
+
+Results are printed as a table on stderr and written as JSON (stdout by
+default) so runs can be diffed. On Linux the peak RSS is reset before each
+route, so peak_rss_kb/rss_growth_kb belong to that route alone; elsewhere
+they fall back to the process-lifetime peak and are marked "cumulative".
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import db  # noqa: E402
+
+DIFFICULTIES = ("easy", "medium", "hard")
+SEED_BATCH = 5000
+
+
+def lifetime_peak_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux.
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def proc_rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if line.startswith(("VmRSS", "VmHWM")))
+    except OSError:
+        return None
+    return {name: int(value.split()[0]) for name, value in fields.items()}
+
+
+def start_rss():
+    # On Linux, writing 5 to clear_refs resets VmHWM (the peak RSS), so each
+    # route's peak covers that route alone. Elsewhere only the process
+    # lifetime peak is available, and the numbers are labelled cumulative.
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return None
+    status = proc_rss_kb()
+    return status["VmRSS"] if status else None
+
+
+def finish_rss(start_kb):
+    status = proc_rss_kb() if start_kb is not None else None
+    if status is None:
+        return {"peak_rss_kb": lifetime_peak_rss_kb(), "rss_growth_kb": None, "rss_scope": "cumulative"}
+    return {
+        "peak_rss_kb": status["VmHWM"],
+        "rss_growth_kb": status["VmHWM"] - start_kb,
+        "rss_scope": "route",
+    }
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(route, latencies, elapsed, errors, rss):
+    ms = [t * 1000 for t in latencies]
+    return {
+        "route": route,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "throughput_rps": len(latencies) / elapsed if elapsed else None,
+        **rss,
+    }
+
+
+def connect(args):
+    if args.backend == "mongomock":
+        import mongomock
+        db.configure(db_name=args.db_name)
+        db.use_client(mongomock.MongoClient())
+    else:
+        db.configure(uri=args.uri, db_name=args.db_name)
+    db.get_client().drop_database(args.db_name)
+
+
+def seed(size):
+    from app import DEFAULT_USER_ID, build_flashcard, card_cache, schedule_new_cards
+    database = db.get_db()
+    for name in database.list_collection_names():
+        database[name].delete_many({})
+    card_cache.clear()
+
+    rng = random.Random(size)
+    for start in range(0, size, SEED_BATCH):
+        # Built the same way POST /flashcards builds them, so grading takes
+        # the precompiled accepted_answers path.
+        cards = [
+            {
+                **build_flashcard({
+                    "question": f"Question {i}?",
+                    "answer": f"answer {i}",
+                    "hint": f"hint {i}",
+                    "difficulty": rng.choice(DIFFICULTIES),
+                }),
+                "user_id": DEFAULT_USER_ID,
+            }
+            for i in range(start, min(size, start + SEED_BATCH))
+        ]
+        database.flashcards.insert_many(cards, ordered=False)
+        schedule_new_cards(DEFAULT_USER_ID, cards)
+    return [str(c["_id"]) for c in database.flashcards.find({}, {"_id": 1}).limit(1000)]
+
+
+def route_plan(ids):
+    # (label, method, path, json body factory) for every route.
+    new_card = lambda i: {"question": f"Bench {i}?", "answer": "yes", "hint": "", "difficulty": "easy"}
+    return [
+        ("GET /flashcards", "GET", lambda i: "/flashcards", None),
+        ("GET /flashcards?limit=100", "GET", lambda i: "/flashcards?limit=100", None),
+        ("POST /flashcards", "POST", lambda i: "/flashcards", new_card),
+        ("GET /quiz", "GET", lambda i: "/quiz", None),
+        ("GET /quiz?difficulty=hard", "GET", lambda i: "/quiz?difficulty=hard", None),
+        ("POST /answer", "POST", lambda i: "/answer",
+         lambda i: {"id": ids[i % len(ids)], "answer": "wrong" if i % 2 else f"answer {i}"}),
+        ("GET /mistakes", "GET", lambda i: "/mistakes", None),
+        ("DELETE /flashcards/<id>", "DELETE", lambda i: f"/flashcards/{ids[-1 - (i % len(ids))]}", None),
+    ]
+
+
+def run_test_client(ids, args):
+    from app import app
+    client = app.test_client()
+    results = []
+    for label, method, path, body in route_plan(ids):
+        latencies = []
+        errors = 0
+        count = min(args.requests, len(ids)) if method == "DELETE" else args.requests
+        rss_start = start_rss()
+        started = time.perf_counter()
+        for i in range(count):
+            t0 = time.perf_counter()
+            resp = client.open(path(i), method=method, json=body(i) if body else None)
+            latencies.append(time.perf_counter() - t0)
+            if resp.status_code >= 500:
+                errors += 1
+        elapsed = time.perf_counter() - started
+        results.append(summarize(label, latencies, elapsed, errors, finish_rss(rss_start)))
+    return results
+
+
+def start_server():
+    from werkzeug.serving import make_server
+    from app import app
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def http_call(base, method, path, body):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base + path, data=data, method=method)
+    if data is not None:
+        req.add_header("Content-Type", "application/json")
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return time.perf_counter() - t0, status
+
+
+def run_http(ids, args, base=None):
+    server = None
+    if base is None:
+        server, base = start_server()
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for label, method, path, body in route_plan(ids):
+                count = min(args.requests, len(ids)) if method == "DELETE" else args.requests
+                rss_start = start_rss() if server is not None else None
+                started = time.perf_counter()
+                calls = [
+                    pool.submit(http_call, base, method, path(i), body(i) if body else None)
+                    for i in range(count)
+                ]
+                outcomes = [c.result() for c in calls]
+                elapsed = time.perf_counter() - started
+                errors = sum(1 for _, status in outcomes if status >= 500)
+                # An external server's memory is not visible from here.
+                rss = finish_rss(rss_start) if server is not None else {
+                    "peak_rss_kb": None, "rss_growth_kb": None, "rss_scope": "external server"
+                }
+                results.append(summarize(label, [t for t, _ in outcomes], elapsed, errors, rss))
+    finally:
+        if server is not None:
+            server.shutdown()
+    return results
+
+
+def print_table(report):
+    out = sys.stderr
+    for run in report["runs"]:
+        out.write(f"\n== {run['mode']}  deck={run['deck_size']}\n")
+        out.write(
+            f"{'route':32} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} "
+            f"{'peak MB':>8} {'+MB':>7}  rss scope\n"
+        )
+        for r in run["routes"]:
+            peak = f"{r['peak_rss_kb'] / 1024:>8.1f}" if r["peak_rss_kb"] is not None else f"{'-':>8}"
+            growth = f"{r['rss_growth_kb'] / 1024:>7.1f}" if r["rss_growth_kb"] is not None else f"{'-':>7}"
+            out.write(
+                f"{r['route']:32} {r['requests']:>6} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+                f"{r['p99_ms']:>9.2f} {r['throughput_rps']:>9.1f} {peak} {growth}  {r['rss_scope']}\n"
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated deck sizes")
+    parser.add_argument("--backend", choices=("mongomock", "mongod"), default="mongomock")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="flashfocus_bench")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=16, help="HTTP client threads")
+    parser.add_argument("--http", action="store_true", help="also run the HTTP load generator")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    connect(args)
+    report = {
+        "backend": args.backend,
+        "python": platform.python_version(),
+        "requests_per_route": args.requests,
+        "concurrency": args.concurrency,
+        "runs": [],
+    }
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        ids = seed(size)
+        report["runs"].append({"mode": "test_client", "deck_size": size, "routes": run_test_client(ids, args)})
+        if args.http:
+            ids = seed(size)
+            report["runs"].append({"mode": "http", "deck_size": size, "routes": run_http(ids, args)})
+
+    print_table(report)
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
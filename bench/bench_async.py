@@ -0,0 +1,101 @@
+"""Compare the sync Flask app with the async ASGI app on the same mongod.
+
+Starts app:app under gunicorn (threaded workers) and asgi:app under uvicorn,
+both pointed at one scratch database, and drives each with the HTTP load
+generator from bench_api.py at the same concurrency.
+
+    python bench/bench_async.py --size 10000 --concurrency 256 --output cmp.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench_api  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def server_commands(args):
+    return {
+        "sync": [
+            sys.executable, "-m", "gunicorn", "app:app",
+            "--workers", str(args.workers), "--threads", str(args.threads),
+            "--bind", f"127.0.0.1:{args.sync_port}",
+        ],
+        "async": [
+            sys.executable, "-m", "uvicorn", "asgi:app",
+            "--workers", str(args.workers), "--port", str(args.async_port),
+            "--log-level", "warning",
+        ],
+    }
+
+
+def wait_until_ready(base, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(base + "/mistakes") as resp:
+                if resp.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base} did not come up")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=10000, help="deck size")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="flashfocus_bench")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per sync worker")
+    parser.add_argument("--sync-port", type=int, default=5101)
+    parser.add_argument("--async-port", type=int, default=5102)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    args.backend = "mongod"
+
+    env = {**os.environ, "MONGO_URI": args.uri, "MONGO_DB_NAME": args.db_name}
+    ports = {"sync": args.sync_port, "async": args.async_port}
+    bench_api.connect(args)
+
+    report = {
+        "deck_size": args.size,
+        "requests_per_route": args.requests,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "runs": [],
+    }
+    for mode, command in server_commands(args).items():
+        ids = bench_api.seed(args.size)
+        proc = subprocess.Popen(command, cwd=ROOT, env=env)
+        try:
+            base = f"http://127.0.0.1:{ports[mode]}"
+            wait_until_ready(base)
+            routes = bench_api.run_http(ids, args, base=base)
+        finally:
+            proc.terminate()
+            proc.wait()
+        report["runs"].append({"mode": mode, "deck_size": args.size, "routes": routes})
+
+    bench_api.print_table(report)
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
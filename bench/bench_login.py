@@ -0,0 +1,138 @@
+"""Login throughput under a brute-force burst, with and without the limiter.
+
+Attacker threads hammer one username with wrong passwords from a handful of
+IPs while a legitimate user keeps logging in. Each attempt goes through the
+same path as login_view: the limiter check, then a Django password hash check
+standing in for authenticate. Runs once with the limiter disabled and once
+with it enabled, and reports attempts/s, hashes computed and the latency the
+legitimate user sees.
+
+    python bench/bench_login.py --attempts 2000 --concurrency 16 --output login.json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.configure(PASSWORD_HASHERS=["django.contrib.auth.hashers.PBKDF2PasswordHasher"])
+django.setup()
+
+from django.contrib.auth.hashers import check_password, make_password  # noqa: E402
+
+import bench_api  # noqa: E402
+from ratelimit import FailedLoginLimiter  # noqa: E402
+
+VICTIM = "victim"
+LEGIT = "alice"
+PASSWORD = "correct horse battery staple"
+
+
+def attempt(limiter, stored, username, password, ip, counters):
+    started = time.perf_counter()
+    if limiter and limiter.retry_after(username, ip):
+        outcome = "throttled"
+    else:
+        with counters["lock"]:
+            counters["hashes"] += 1
+        if check_password(password, stored[username]):
+            outcome = "ok"
+            if limiter:
+                limiter.reset(username)
+        else:
+            outcome = "failed"
+            if limiter:
+                limiter.record_failure(username, ip)
+    return outcome, time.perf_counter() - started
+
+
+def run(mode, args, stored):
+    limiter = FailedLoginLimiter() if mode == "limited" else None
+    counters = {"hashes": 0, "lock": threading.Lock()}
+    outcomes = {"ok": 0, "failed": 0, "throttled": 0}
+    legit_latencies = []
+    stop = threading.Event()
+
+    def legit_user():
+        while not stop.is_set():
+            outcome, elapsed = attempt(limiter, stored, LEGIT, PASSWORD, "10.0.0.1", counters)
+            legit_latencies.append(elapsed)
+            if outcome != "ok":
+                outcomes[outcome] += 1
+
+    def attacker(i):
+        ip = f"203.0.113.{i % args.attacker_ips}"
+        return attempt(limiter, stored, VICTIM, f"guess-{i}", ip, counters)
+
+    legit = threading.Thread(target=legit_user)
+    legit.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(attacker, range(args.attempts)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    legit.join()
+
+    for outcome, _ in results:
+        outcomes[outcome] += 1
+    legit_ms = [t * 1000 for t in legit_latencies]
+    return {
+        "mode": mode,
+        "attempts": args.attempts,
+        "elapsed_s": elapsed,
+        "attempts_per_s": args.attempts / elapsed if elapsed else None,
+        "hashes": counters["hashes"],
+        "outcomes": outcomes,
+        "legit_logins": len(legit_ms),
+        "legit_p50_ms": bench_api.percentile(legit_ms, 50),
+        "legit_p99_ms": bench_api.percentile(legit_ms, 99),
+    }
+
+
+def print_table(report):
+    header = f"{'mode':<10} {'attempts/s':>11} {'hashes':>8} {'throttled':>10} {'legit p50':>10} {'legit p99':>10}"
+    print(header, file=sys.stderr)
+    print("-" * len(header), file=sys.stderr)
+    for result in report["runs"]:
+        print(
+            f"{result['mode']:<10} {result['attempts_per_s']:>11.1f} {result['hashes']:>8} "
+            f"{result['outcomes']['throttled']:>10} {result['legit_p50_ms'] or 0:>10.2f} "
+            f"{result['legit_p99_ms'] or 0:>10.2f}",
+            file=sys.stderr
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attempts", type=int, default=2000, help="bad login attempts in the burst")
+    parser.add_argument("--concurrency", type=int, default=16, help="attacker threads")
+    parser.add_argument("--attacker-ips", type=int, default=4, help="distinct attacker IPs")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    stored = {name: make_password(PASSWORD) for name in (VICTIM, LEGIT)}
+    report = {
+        "hasher": settings.PASSWORD_HASHERS[0],
+        "concurrency": args.concurrency,
+        "attacker_ips": args.attacker_ips,
+        "runs": [run(mode, args, stored) for mode in ("unlimited", "limited")],
+    }
+
+    print_table(report)
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
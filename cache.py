@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return MISSING
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Per-scope (per-user) card cache: cards by id plus a serialized snapshot of
+# the scope's deck. With a version_source, each scope's version is polled at
+# most every check_interval seconds; when it moves, the scope's generation is
+# bumped so its old entries become unreachable and age out of the LRU, which
+# makes writes from other worker processes visible without a round trip per
+# read.
+class CardCache:
+    def __init__(self, maxsize, ttl, version_source=None, check_interval=1.0):
+        self.cards = TTLCache(maxsize, ttl)
+        self.decks = TTLCache(maxsize, ttl)
+        self.ttl = ttl
+        self.version_source = version_source
+        self.check_interval = check_interval
+        self._scopes = {}
+        self._lock = threading.Lock()
+
+    def _state(self, scope):
+        with self._lock:
+            state = self._scopes.get(scope)
+            if state is None:
+                state = self._scopes[scope] = {"generation": 0, "version": None, "checked_at": 0, "writes": 0}
+            return state
+
+    def _generation(self, scope):
+        state = self._state(scope)
+        if self.version_source is not None:
+            now = time.monotonic()
+            if now - state["checked_at"] >= self.check_interval:
+                state["checked_at"] = now
+                version = self.version_source(scope)
+                if version != state["version"]:
+                    state["version"] = version
+                    state["generation"] += 1
+        return state["generation"]
+
+    # A loader that started before an invalidate() (or clear()) may return a
+    # snapshot from before the write, so results are only stored if the
+    # scope's write token is unchanged once the loader returns.
+    def _writes(self, scope):
+        state = self._state(scope)
+        return state, state["writes"]
+
+    def _unchanged(self, scope, token):
+        state, writes = token
+        return self._state(scope) is state and state["writes"] == writes
+
+    def get_card(self, scope, key, loader):
+        cache_key = (scope, self._generation(scope), key)
+        card = self.cards.get(cache_key)
+        if card is MISSING:
+            token = self._writes(scope)
+            card = loader()
+            if card is not None and self._unchanged(scope, token):
+                self.cards.set(cache_key, card)
+        return card
+
+    def get_cards(self, scope, keys, loader):
+        generation = self._generation(scope)
+        found = {}
+        missing = []
+        for key in keys:
+            card = self.cards.get((scope, generation, key))
+            if card is MISSING:
+                missing.append(key)
+            else:
+                found[key] = card
+        if missing:
+            token = self._writes(scope)
+            loaded = loader(missing)
+            fresh = self._unchanged(scope, token)
+            for key, card in loaded.items():
+                if fresh:
+                    self.cards.set((scope, generation, key), card)
+                found[key] = card
+        return found
+
+    # Decks are stored with the version they were loaded at (None when the
+    # caller has none). Passing a version to peek_deck/get_deck only accepts
+    # a snapshot at least that new, so a caller that has just read the
+    # version counter never serves an older deck under it.
+    def peek_deck(self, scope, version=None):
+        entry = self.decks.get((scope, self._generation(scope)))
+        if entry is MISSING:
+            return None
+        loaded_at, deck = entry
+        if version is not None and (loaded_at is None or loaded_at < version):
+            return None
+        return deck
+
+    def get_deck(self, scope, loader, version=None):
+        deck = self.peek_deck(scope, version)
+        if deck is None:
+            token = self._writes(scope)
+            deck = loader()
+            if self._unchanged(scope, token):
+                self.decks.set((scope, self._generation(scope)), (version, deck))
+        return deck
+
+    def invalidate(self, scope, key=None):
+        state = self._state(scope)
+        with self._lock:
+            state["writes"] += 1
+        self.decks.pop((scope, self._generation(scope)))
+        if key is not None:
+            self.cards.pop((scope, self._generation(scope), key))
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+        self.cards.clear()
+        self.decks.clear()
+
+    def stats(self):
+        return {
+            "cards": {"size": len(self.cards), "hits": self.cards.hits, "misses": self.cards.misses},
+            "decks": {"size": len(self.decks), "hits": self.decks.hits, "misses": self.decks.misses},
+            "scopes": len(self._scopes)
+        }
@@ -0,0 +1,160 @@
+# Request parsing, validation and serialization shared by the Flask app
+# (app.py) and the async app (asgi.py).
+import os
+
+from matching import compile_answers, matches
+
+MAX_QUIZ_COUNT = 100
+MAX_PAGE_SIZE = 500
+CARD_FIELDS = ("question", "answer", "hint", "difficulty", "alternates", "deck_id")
+DEFAULT_DECK_ID = "default"
+MISTAKE_SORTS = {
+    "count": {"count": -1, "_id": 1},
+    "recent": {"last_missed": -1, "_id": 1}
+}
+
+# Every route is scoped to the caller named in X-User-Id, which is trusted
+# as-is: it must be set (and any client-sent copy stripped) by the auth
+# proxy in front of the app, and the app must not be reachable except
+# through that proxy. Requests without it act as DEFAULT_USER_ID, which
+# keeps single-user installs working unchanged. Multi-user deployments
+# should set FLASHFOCUS_REQUIRE_USER=1 so a misconfigured proxy yields 401s
+# instead of quietly merging everyone into one user.
+DEFAULT_USER_ID = os.environ.get("FLASHFOCUS_DEFAULT_USER", "public")
+REQUIRE_USER = os.environ.get("FLASHFOCUS_REQUIRE_USER") == "1"
+# Endpoints that stay reachable without a user (page shell, Prometheus).
+ANONYMOUS_PATHS = ("/", "/metrics")
+
+def user_from_headers(headers):
+    return headers.get("X-User-Id", "").strip() or DEFAULT_USER_ID
+
+def missing_user(path, headers):
+    return REQUIRE_USER and path not in ANONYMOUS_PATHS and not headers.get("X-User-Id", "").strip()
+
+def parse_positive_int(raw, maximum):
+    value = int(raw)
+    if value < 1:
+        raise ValueError(raw)
+    return min(value, maximum)
+
+def parse_fields(raw):
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    for field in fields:
+        if field not in CARD_FIELDS:
+            raise ValueError(field)
+    return fields
+
+def serialize_flashcard(doc, fields=None):
+    if fields is not None:
+        out = {"_id": str(doc["_id"])}
+        for field in fields:
+            out[field] = doc.get(field, "")
+        return out
+    return {
+        "_id": str(doc["_id"]),
+        "question": doc["question"],
+        "answer": doc["answer"],
+        "hint": doc.get("hint", ""),
+        "difficulty": doc.get("difficulty", ""),
+        "alternates": doc.get("alternates", []),
+        "deck_id": doc.get("deck_id", DEFAULT_DECK_ID)
+    }
+
+def build_flashcard(data):
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+
+    def text(key):
+        value = data.get(key, "")
+        return value.strip() if isinstance(value, str) else ""
+
+    question = text("question")
+    answer = text("answer")
+    hint = text("hint")
+    difficulty = text("difficulty")
+    deck_id = text("deck_id") or DEFAULT_DECK_ID
+
+    if not question or not answer or not difficulty:
+        raise ValueError("Question, answer, and difficulty required")
+
+    # Alternates come as a JSON list, or "|"-separated in CSV imports.
+    alternates = data.get("alternates") or []
+    if isinstance(alternates, str):
+        alternates = alternates.split("|")
+    if not isinstance(alternates, list) or not all(isinstance(a, str) for a in alternates):
+        raise ValueError("alternates must be a list of strings")
+    alternates = [a.strip() for a in alternates if a.strip()]
+
+    # Grading only ever compares against accepted_answers, so a card without
+    # any would be impossible to answer correctly.
+    accepted = compile_answers(answer, alternates)
+    if not accepted:
+        raise ValueError("Answer has no gradeable text")
+
+    return {
+        "question": question,
+        "answer": answer,
+        "hint": hint,
+        "difficulty": difficulty,
+        "alternates": alternates,
+        "deck_id": deck_id,
+        # Normalized once here so grading never re-normalizes the card.
+        "accepted_answers": accepted
+    }
+
+def grade_answer(card, user_answer):
+    accepted = card.get("accepted_answers")
+    if accepted is None:
+        accepted = compile_answers(card["answer"], card.get("alternates", []))
+    return matches(user_answer, accepted)
+
+def answer_result(card, correct):
+    if correct:
+        return {"correct": True}
+    return {"correct": False, "correct_answer": card["answer"]}
+
+def parse_mistake_page(args):
+    sort = MISTAKE_SORTS.get(args.get("sort", "count"))
+    if sort is None:
+        raise ValueError("sort must be one of: " + ", ".join(MISTAKE_SORTS))
+    try:
+        limit = parse_positive_int(args.get("limit", 50), MAX_PAGE_SIZE)
+        offset = int(args.get("offset", 0))
+        if offset < 0:
+            raise ValueError(offset)
+    except ValueError:
+        raise ValueError("Invalid limit or offset")
+    return sort, limit, offset
+
+# Pages through a user's mistakes on the sort index and joins each row to its
+# card server-side. Mistakes whose card is gone are kept through the unwind
+# (card is null) so a page is always limit + 1 rows when more follow;
+# mistake_page drops them after working out next_offset.
+def mistake_page_pipeline(user, sort, limit, offset):
+    return [
+        {"$match": {"user_id": user}},
+        {"$sort": sort},
+        {"$skip": offset},
+        {"$limit": limit + 1},
+        {"$lookup": {
+            "from": "flashcards",
+            "let": {"fid": {"$convert": {"input": "$flashcard_id", "to": "objectId", "onError": None}}},
+            "pipeline": [{"$match": {"$expr": {"$eq": ["$_id", "$$fid"]}}}],
+            "as": "card"
+        }},
+        {"$unwind": {"path": "$card", "preserveNullAndEmptyArrays": True}}
+    ]
+
+def mistake_page(rows, limit, offset):
+    next_offset = offset + limit if len(rows) > limit else None
+    items = []
+    for row in rows[:limit]:
+        if not row.get("card"):
+            continue
+        last_missed = row.get("last_missed")
+        items.append({
+            **serialize_flashcard(row["card"]),
+            "mistake_count": row.get("count", 1),
+            "last_missed": last_missed.isoformat() + "Z" if last_missed else None
+        })
+    return {"items": items, "next_offset": next_offset}
@@ -0,0 +1,119 @@
+import os
+import threading
+
+from pymongo import MongoClient
+
+# Connection settings. Anything not passed to configure() falls back to the
+# environment, then to these defaults.
+DEFAULTS = {
+    "uri": "mongodb://localhost:27017",
+    "db_name": "flashfocus",
+    "max_pool_size": 100,
+    "min_pool_size": 0,
+    "server_selection_timeout_ms": 5000,
+    "connect_timeout_ms": 5000,
+    "socket_timeout_ms": 30000,
+    "read_preference": "primary",
+}
+
+ENV_VARS = {
+    "uri": "MONGO_URI",
+    "db_name": "MONGO_DB_NAME",
+    "max_pool_size": "MONGO_MAX_POOL_SIZE",
+    "min_pool_size": "MONGO_MIN_POOL_SIZE",
+    "server_selection_timeout_ms": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+    "connect_timeout_ms": "MONGO_CONNECT_TIMEOUT_MS",
+    "socket_timeout_ms": "MONGO_SOCKET_TIMEOUT_MS",
+    "read_preference": "MONGO_READ_PREFERENCE",
+}
+
+_overrides = {}
+_listeners = []
+_client = None
+_client_pid = None
+_pinned = False
+_lock = threading.Lock()
+
+
+def configure(**settings):
+    global _client
+    unknown = set(settings) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown database settings: {', '.join(sorted(unknown))}")
+    with _lock:
+        _overrides.update({k: v for k, v in settings.items() if v is not None})
+        if not _pinned:
+            _client = None
+
+
+def add_listener(listener):
+    # Event listeners are fixed when a client is built, so register them
+    # before the first query (or call configure() again afterwards). A
+    # client pinned with use_client() is kept; it just won't report events.
+    global _client
+    with _lock:
+        _listeners.append(listener)
+        if not _pinned:
+            _client = None
+
+
+def use_client(client):
+    # Pin an already-built client (e.g. mongomock in benchmarks) for this
+    # process. configure() and add_listener() leave a pinned client in place;
+    # use_client(None) unpins it.
+    global _client, _client_pid, _pinned
+    with _lock:
+        _client = client
+        _client_pid = os.getpid()
+        _pinned = client is not None
+
+
+def get_setting(name):
+    if name in _overrides:
+        value = _overrides[name]
+    else:
+        value = os.environ.get(ENV_VARS[name], DEFAULTS[name])
+    if isinstance(DEFAULTS[name], int):
+        return int(value)
+    return value
+
+
+def get_client():
+    global _client, _client_pid
+    pid = os.getpid()
+    # A client created before fork (e.g. in a gunicorn master) must not be
+    # reused in the child, so every process builds its own on first use.
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                _client = MongoClient(
+                    get_setting("uri"),
+                    maxPoolSize=get_setting("max_pool_size"),
+                    minPoolSize=get_setting("min_pool_size"),
+                    serverSelectionTimeoutMS=get_setting("server_selection_timeout_ms"),
+                    connectTimeoutMS=get_setting("connect_timeout_ms"),
+                    socketTimeoutMS=get_setting("socket_timeout_ms"),
+                    readPreference=get_setting("read_preference"),
+                    event_listeners=list(_listeners),
+                )
+                _client_pid = pid
+    return _client
+
+
+def get_db():
+    return get_client().get_default_database(default=get_setting("db_name"))
+
+
+def get_collection(name):
+    return get_db()[name]
+
+
+class LazyCollection:
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_collection(self.name), attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self.name!r})"
@@ -0,0 +1,113 @@
+import csv
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from mongoengine.queryset.visitor import Q
+
+from .aggregates import CATEGORIES
+
+HISTORY_PAGE_SIZE = 25
+MAX_HISTORY_PAGE_SIZE = 200
+EXPORT_BATCH_SIZE = 500
+CURSOR_DATE_FORMAT = '%Y%m%dT%H%M%S.%f'
+
+# Every history query filters on user_id and walks (date, _id) newest first.
+HISTORY_INDEX = [('user_id', 1), ('date', -1), ('_id', -1)]
+
+ENTRY_FIELDS = ['date', 'salary', 'budget', 'expenses']
+DETAILED_FIELDS = (
+    ['date', 'salary']
+    + [f'budget_{key}' for key, _, _ in CATEGORIES]
+    + [f'expense_{key}' for key, _, _ in CATEGORIES]
+)
+
+_indexed = set()
+
+
+# models.py owns the collections, so the index is created on first use
+# (once per process and model) rather than declared in the model meta.
+def ensure_history_index(model):
+    if model not in _indexed:
+        model._get_collection().create_index(HISTORY_INDEX, name='user_date_id')
+        _indexed.add(model)
+
+
+def encode_cursor(entry):
+    return f'{entry.date.strftime(CURSOR_DATE_FORMAT)}_{entry.id}'
+
+
+def decode_cursor(cursor):
+    try:
+        date, oid = cursor.split('_', 1)
+        return datetime.strptime(date, CURSOR_DATE_FORMAT), ObjectId(oid)
+    except (ValueError, InvalidId):
+        return None
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', HISTORY_PAGE_SIZE))
+    except ValueError:
+        return HISTORY_PAGE_SIZE
+    return min(max(limit, 1), MAX_HISTORY_PAGE_SIZE)
+
+
+# One page of a user's entries, newest first, resuming strictly after the
+# cursor's (date, id). Returns the entries and the cursor for the next page,
+# or None once the history is exhausted.
+def history_page(model, user_id, cursor=None, limit=HISTORY_PAGE_SIZE):
+    ensure_history_index(model)
+    query = Q(user_id=user_id)
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        date, oid = position
+        query &= Q(date__lt=date) | Q(date=date, id__lt=oid)
+
+    entries = list(model.objects(query).order_by('-date', '-id').limit(limit + 1))
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor(entries[-1])
+    return entries, next_cursor
+
+
+def _export_rows(model, user_id, fields):
+    ensure_history_index(model)
+    projection = {field: 1 for field in fields}
+    projection['_id'] = 0
+    docs = (
+        model._get_collection()
+        .find({'user_id': user_id}, projection)
+        .sort([('date', -1), ('_id', -1)])
+        .batch_size(EXPORT_BATCH_SIZE)
+    )
+    for doc in docs:
+        row = {}
+        for field in fields:
+            value = doc.get(field)
+            if field == 'date' and value is not None:
+                value = value.isoformat()
+            elif value is not None and not isinstance(value, (int, float)):
+                value = str(value)
+            row[field] = value
+        yield row
+
+
+# csv.writer only needs an object with write(); returning the line lets the
+# generator hand each row straight to the response.
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def export_lines(model, user_id, fields, fmt):
+    if fmt == 'ndjson':
+        for row in _export_rows(model, user_id, fields):
+            yield json.dumps(row) + '\n'
+        return
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in _export_rows(model, user_id, fields):
+        yield writer.writerow(['' if row[field] is None else row[field] for field in fields])
@@ -0,0 +1,85 @@
+import logging
+import sys
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# Every secondary index the routes rely on, keyed by collection. Anything
+# else found on these collections (besides _id_) is reported as redundant.
+INDEXES = {
+    "flashcards": [
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id_1__id_1"),
+        IndexModel([("user_id", ASCENDING), ("deck_id", ASCENDING), ("_id", ASCENDING)], name="user_id_1_deck_id_1__id_1"),
+        IndexModel(
+            [("user_id", ASCENDING), ("deck_id", ASCENDING), ("difficulty", ASCENDING)],
+            name="user_id_1_deck_id_1_difficulty_1"
+        ),
+    ],
+    "mistakes": [
+        IndexModel([("user_id", ASCENDING), ("flashcard_id", ASCENDING)], name="user_id_1_flashcard_id_1", unique=True),
+        IndexModel(
+            [("user_id", ASCENDING), ("count", DESCENDING), ("_id", ASCENDING)],
+            name="user_id_1_count_-1__id_1"
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("last_missed", DESCENDING), ("_id", ASCENDING)],
+            name="user_id_1_last_missed_-1__id_1"
+        ),
+    ],
+    "reviews": [
+        IndexModel([("user_id", ASCENDING), ("flashcard_id", ASCENDING)], name="user_id_1_flashcard_id_1", unique=True),
+        IndexModel([("user_id", ASCENDING), ("due", ASCENDING)], name="user_id_1_due_1"),
+    ],
+}
+
+
+def _key(spec):
+    # IndexModel keys are mappings, index_information() keys are lists of
+    # pairs; directions may come back from the server as floats.
+    pairs = spec.items() if hasattr(spec, "items") else spec
+    return tuple(
+        (field, int(direction) if isinstance(direction, float) else direction)
+        for field, direction in pairs
+    )
+
+
+def ensure_indexes(database=None, drop_redundant=False):
+    database = database if database is not None else db.get_db()
+    report = {"created": [], "redundant": [], "dropped": []}
+
+    for collection_name, models in INDEXES.items():
+        collection = database[collection_name]
+        existing = {
+            name: _key(info["key"]) for name, info in collection.index_information().items()
+        }
+        declared = {_key(model.document["key"]) for model in models}
+
+        missing = [model for model in models if _key(model.document["key"]) not in existing.values()]
+        if missing:
+            for name in collection.create_indexes(missing):
+                report["created"].append(f"{collection_name}.{name}")
+
+        for name, key in existing.items():
+            if name == "_id_" or key in declared:
+                continue
+            report["redundant"].append(f"{collection_name}.{name}")
+            if drop_redundant:
+                collection.drop_index(name)
+                report["dropped"].append(f"{collection_name}.{name}")
+
+    for name in report["created"]:
+        logger.info("Created index %s", name)
+    for name in report["redundant"]:
+        if name in report["dropped"]:
+            logger.info("Dropped redundant index %s", name)
+        else:
+            logger.warning("Index %s is not declared in indexes.py", name)
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    ensure_indexes(drop_redundant="--drop-redundant" in sys.argv[1:])
@@ -0,0 +1,141 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from mongoengine.errors import ValidationError
+from pymongo.errors import BulkWriteError
+
+from .aggregates import CATEGORIES
+
+INGEST_BATCH_SIZE = 1000
+MAX_INGEST_ROWS = 50000
+
+ENTRY_AMOUNTS = ['salary', 'budget', 'expenses']
+DETAILED_AMOUNTS = (
+    ['salary']
+    + [f'budget_{key}' for key, _, _ in CATEGORIES]
+    + [f'expense_{key}' for key, _, _ in CATEGORIES]
+)
+
+
+# Rows of a CSV, JSON array or NDJSON upload as dicts.
+def read_rows(data, fmt='csv'):
+    text = io.StringIO(data)
+
+    if fmt == 'csv':
+        rows = list(csv.DictReader(text))
+    elif fmt == 'json':
+        rows = json.load(text)
+        if not isinstance(rows, list):
+            raise ValueError('JSON upload must be an array of rows')
+    elif fmt == 'ndjson':
+        rows = [json.loads(line) for line in text if line.strip()]
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+    if len(rows) > MAX_INGEST_ROWS:
+        raise ValueError(f'At most {MAX_INGEST_ROWS} rows per upload')
+    return rows
+
+
+def _parse_amount(value):
+    if value is None or value == '':
+        return Decimal(0)
+    amount = Decimal(str(value).strip().replace(',', ''))
+    if not amount.is_finite() or amount < 0:
+        raise InvalidOperation
+    return amount
+
+
+def _parse_date(value, now):
+    if value is None or value == '':
+        return now
+    return datetime.fromisoformat(str(value).strip())
+
+
+# Validates column by column rather than row by row, so each column's parser
+# runs over the whole upload in one loop. Returns the clean rows (with their
+# 1-based row numbers) and a list of {'row', 'error'} for the rejected ones.
+def validate_rows(rows, amount_fields, required=()):
+    now = datetime.now()
+    errors = {}
+    columns = {}
+
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors[index] = 'Row must be an object'
+
+    for field in amount_fields:
+        values = []
+        for index, row in enumerate(rows):
+            if index in errors:
+                values.append(None)
+                continue
+            if field in required and row.get(field) in (None, ''):
+                errors[index] = f'{field} is required'
+                values.append(None)
+                continue
+            try:
+                values.append(_parse_amount(row.get(field)))
+            except (InvalidOperation, ValueError):
+                errors[index] = f'Invalid {field}: {row.get(field)!r}'
+                values.append(None)
+        columns[field] = values
+
+    dates = []
+    for index, row in enumerate(rows):
+        if index in errors:
+            dates.append(None)
+            continue
+        try:
+            dates.append(_parse_date(row.get('date'), now))
+        except ValueError:
+            errors[index] = f'Invalid date: {row.get("date")!r}'
+            dates.append(None)
+    columns['date'] = dates
+
+    clean = [
+        (index + 1, {field: values[index] for field, values in columns.items()})
+        for index in range(len(rows))
+        if index not in errors
+    ]
+    return clean, [{'row': index + 1, 'error': error} for index, error in sorted(errors.items())]
+
+
+# Inserts the clean rows in batches of INGEST_BATCH_SIZE and hands each
+# batch's inserted documents to on_batch once (for rollups and other derived
+# totals). Inserts are unordered, so one bad row neither stops the rest of
+# its batch nor hides which rows were written.
+def insert_rows(model, user, clean, on_batch):
+    collection = model._get_collection()
+    inserted = 0
+    errors = []
+    for start in range(0, len(clean), INGEST_BATCH_SIZE):
+        numbers = []
+        docs = []
+        for number, fields in clean[start:start + INGEST_BATCH_SIZE]:
+            doc = model(user_id=user.id, username=user.username, **fields)
+            try:
+                doc.validate()
+            except ValidationError as e:
+                errors.append({'row': number, 'error': f'Invalid row: {e}'})
+                continue
+            numbers.append(number)
+            docs.append(doc)
+        if not docs:
+            continue
+
+        failed = set()
+        try:
+            collection.insert_many([doc.to_mongo() for doc in docs], ordered=False)
+        except BulkWriteError as e:
+            for err in e.details.get('writeErrors', []):
+                failed.add(err['index'])
+                errors.append({'row': numbers[err['index']], 'error': err.get('errmsg', 'Insert failed')})
+        written = [doc for i, doc in enumerate(docs) if i not in failed]
+        if written:
+            inserted += len(written)
+            on_batch(user.id, written)
+    return inserted, errors
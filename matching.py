@@ -0,0 +1,103 @@
+import os
+import unicodedata
+
+# A target answer earns one allowed edit per CHARS_PER_EDIT characters, up to
+# MAX_EDITS. Answers shorter than CHARS_PER_EDIT must match exactly: one edit
+# on a short word is usually a different word (house/mouse, bread/break).
+MAX_EDITS = int(os.environ.get("FLASHFOCUS_MATCH_MAX_EDITS", 2))
+CHARS_PER_EDIT = int(os.environ.get("FLASHFOCUS_MATCH_CHARS_PER_EDIT", 8))
+
+
+# Only separator punctuation is folded into spaces. Signs, operators,
+# currency and other symbols (and "#", "%", "&", ...) carry meaning, so they
+# are kept and must match exactly.
+SEPARATORS = set(".,;:!?'\"`()[]{}¿¡、。，；：！？")
+
+
+def _fold(text, i, c):
+    prev = text[i - 1] if i > 0 else ""
+    nxt = text[i + 1] if i + 1 < len(text) else ""
+    if c in ".," and prev.isdigit() and nxt.isdigit():
+        return c  # decimal point or thousands separator
+    if c == "-":
+        # A hyphen inside a word is a separator ("well-known"); anywhere else
+        # it is a sign or an operator ("-5", "5-3", "x - y").
+        return " " if prev.isalpha() and nxt.isalpha() else c
+    category = unicodedata.category(c)
+    if c in SEPARATORS or category in ("Pi", "Pf") or category == "Pd":
+        return " "
+    return c
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    folded = "".join(_fold(text, i, c) for i, c in enumerate(text))
+    # An answer made only of separators ("?", "...") must still be
+    # gradeable, so it falls back to the unfolded text.
+    return " ".join(folded.split()) or " ".join(text.split())
+
+
+def compile_answers(answer, alternates=()):
+    accepted = []
+    for candidate in [answer, *alternates]:
+        normalized = normalize(candidate)
+        if normalized and normalized not in accepted:
+            accepted.append(normalized)
+    return accepted
+
+
+def allowed_edits(target):
+    return min(MAX_EDITS, len(target) // CHARS_PER_EDIT) if CHARS_PER_EDIT > 0 else 0
+
+
+def bounded_distance(a, b, limit):
+    # Levenshtein distance restricted to a diagonal band of width `limit`;
+    # returns limit + 1 as soon as the distance is known to exceed it.
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        lo = max(1, i - limit)
+        hi = min(len(b), i + limit)
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        best = current[0]
+        for j in range(lo, hi + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            current[j] = value if value <= limit else over
+            best = min(best, current[j])
+        if best > limit:
+            return over
+        previous = current
+    return previous[len(b)]
+
+
+def skeleton(text):
+    # Digits, signs and symbols in order. Typo tolerance only applies to
+    # letters, so "x > 5" never fuzzy-matches "x < 5" and 100000 never
+    # matches 100001.
+    return "".join(c for c in text if not c.isalpha() and not c.isspace())
+
+
+def matches(user_answer, accepted):
+    guess = normalize(user_answer)
+    if not guess:
+        return False
+    guess_skeleton = None
+    for target in accepted:
+        if guess == target:
+            return True
+        limit = allowed_edits(target)
+        if not limit:
+            continue
+        if guess_skeleton is None:
+            guess_skeleton = skeleton(guess)
+        if guess_skeleton == skeleton(target) and bounded_distance(guess, target, limit) <= limit:
+            return True
+    return False
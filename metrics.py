@@ -0,0 +1,214 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from flask import Response, g, request
+from pymongo import monitoring
+
+import db
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SCOPED_STAGES = ("$match", "$sample", "$limit", "$geoNear", "$search")
+
+# Route of the request currently being served on this thread/task, so Mongo
+# commands can be attributed to it.
+current_route = ContextVar("current_route", default="(background)")
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.requests = defaultdict(int)
+        self.commands = defaultdict(int)
+        self.command_seconds = defaultdict(float)
+        self.command_docs = defaultdict(int)
+        self.command_failures = defaultdict(int)
+        self.full_reads = defaultdict(int)
+
+    def observe_request(self, route, method, status, seconds):
+        with self.lock:
+            self.latency[(route, method)].observe(seconds)
+            self.requests[(route, method, str(status))] += 1
+
+    def observe_command(self, route, command, seconds, docs, failed=False):
+        with self.lock:
+            key = (route, command)
+            self.commands[key] += 1
+            self.command_seconds[key] += seconds
+            self.command_docs[key] += docs
+            if failed:
+                self.command_failures[key] += 1
+
+    def observe_full_read(self, route, collection):
+        with self.lock:
+            self.full_reads[(route, collection)] += 1
+
+    def render(self):
+        lines = []
+        with self.lock:
+            lines.append("# HELP flashfocus_http_request_duration_seconds Request latency by route.")
+            lines.append("# TYPE flashfocus_http_request_duration_seconds histogram")
+            for (route, method), hist in sorted(self.latency.items()):
+                labels = f'route="{_escape(route)}",method="{method}"'
+                for bound, count in zip(hist.buckets, hist.counts):
+                    lines.append(f'flashfocus_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'flashfocus_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {hist.total}')
+                lines.append(f"flashfocus_http_request_duration_seconds_sum{{{labels}}} {hist.sum}")
+                lines.append(f"flashfocus_http_request_duration_seconds_count{{{labels}}} {hist.total}")
+
+            _counter(lines, "flashfocus_http_requests_total", "Requests by route and status.",
+                     self.requests, ("route", "method", "status"))
+            _counter(lines, "flashfocus_mongo_commands_total", "Mongo commands issued per route.",
+                     self.commands, ("route", "command"))
+            _counter(lines, "flashfocus_mongo_command_seconds_total", "Time spent in Mongo commands per route.",
+                     self.command_seconds, ("route", "command"))
+            _counter(lines, "flashfocus_mongo_documents_returned_total", "Documents returned by Mongo per route.",
+                     self.command_docs, ("route", "command"))
+            _counter(lines, "flashfocus_mongo_command_failures_total", "Failed Mongo commands per route.",
+                     self.command_failures, ("route", "command"))
+            _counter(lines, "flashfocus_mongo_full_collection_reads_total",
+                     "Unfiltered, unbounded reads that scan a whole collection.",
+                     self.full_reads, ("route", "collection"))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _counter(lines, name, help_text, values, label_names):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for key, value in sorted(values.items()):
+        labels = ",".join(f'{label}="{_escape(part)}"' for label, part in zip(label_names, key))
+        lines.append(f"{name}{{{labels}}} {value}")
+
+
+def is_full_collection_read(command_name, command):
+    if command_name == "find":
+        return not command.get("filter") and not command.get("limit")
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        return not pipeline or next(iter(pipeline[0]), None) not in SCOPED_STAGES
+    return False
+
+
+def documents_returned(reply):
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    return reply.get("n", 0) if isinstance(reply.get("n"), int) else 0
+
+
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.pending = {}
+
+    def started(self, event):
+        route = current_route.get()
+        self.pending[(event.connection_id, event.request_id)] = route
+        if is_full_collection_read(event.command_name, event.command):
+            collection = event.command.get(event.command_name)
+            self.metrics.observe_full_read(route, collection)
+
+    def succeeded(self, event):
+        route = self.pending.pop((event.connection_id, event.request_id), current_route.get())
+        self.metrics.observe_command(
+            route, event.command_name, event.duration_micros / 1e6, documents_returned(event.reply)
+        )
+
+    def failed(self, event):
+        route = self.pending.pop((event.connection_id, event.request_id), current_route.get())
+        self.metrics.observe_command(route, event.command_name, event.duration_micros / 1e6, 0, failed=True)
+
+
+metrics = Metrics()
+
+
+def init_app(app):
+    db.add_listener(CommandMetrics(metrics))
+    slow_ms = os.environ.get("FLASHFOCUS_SLOW_REQUEST_MS")
+    slow_seconds = float(slow_ms) / 1000 if slow_ms else None
+    profile_dir = os.environ.get("FLASHFOCUS_PROFILE_DIR")
+
+    @app.before_request
+    def start_timer():
+        route = request.url_rule.rule if request.url_rule else "(unmatched)"
+        g.metrics_route = route
+        g.metrics_token = current_route.set(route)
+        g.profiler = None
+        if slow_seconds is not None:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                g.profiler = profiler
+            except ValueError:
+                # Another profiler is already active (e.g. a concurrent
+                # request on 3.12+); skip profiling this one.
+                pass
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(resp):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return resp
+        elapsed = time.perf_counter() - started
+        metrics.observe_request(g.metrics_route, request.method, resp.status_code, elapsed)
+
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            if elapsed >= slow_seconds:
+                log_slow_request(profiler, elapsed, profile_dir)
+        return resp
+
+    @app.teardown_request
+    def reset_route(exc):
+        token = g.pop("metrics_token", None)
+        if token is not None:
+            current_route.reset(token)
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+
+    @app.route("/metrics", methods=["GET"])
+    def get_metrics():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+def log_slow_request(profiler, elapsed, profile_dir):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(30)
+    logger.warning(
+        "Slow request %s %s took %.1f ms\n%s",
+        request.method, request.full_path, elapsed * 1000, out.getvalue()
+    )
+    if profile_dir:
+        name = f"{int(time.time() * 1000)}-{request.method}-{g.metrics_route.strip('/').replace('/', '_') or 'root'}.prof"
+        profiler.dump_stats(os.path.join(profile_dir, name))
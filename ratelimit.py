@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Failed logins allowed per username and per client IP inside WINDOW seconds.
+# Once a key is over its limit, login attempts for it are refused before the
+# password is hashed, until the oldest failure ages out of the window.
+MAX_USER_FAILURES = int(os.environ.get('FLASHFOCUS_LOGIN_MAX_USER_FAILURES', 5))
+MAX_IP_FAILURES = int(os.environ.get('FLASHFOCUS_LOGIN_MAX_IP_FAILURES', 20))
+WINDOW = float(os.environ.get('FLASHFOCUS_LOGIN_WINDOW', 300))
+MAX_KEYS = 100000
+
+# Behind a reverse proxy every request's REMOTE_ADDR is the proxy, so all
+# users would share one IP budget. Set FLASHFOCUS_TRUSTED_PROXY_HOPS to the
+# number of proxies in front of the app that append to X-Forwarded-For; the
+# client is then the address the outermost of them saw. Entries further left
+# are client-supplied and never trusted. If the proxies cannot be counted on
+# to append, set FLASHFOCUS_LOGIN_MAX_IP_FAILURES=0 to turn the per-IP limit
+# off and rely on the per-username one.
+TRUSTED_PROXY_HOPS = int(os.environ.get('FLASHFOCUS_TRUSTED_PROXY_HOPS', 0))
+
+
+# In-process sliding-window counter of failed logins. Each worker keeps its
+# own counts, so the effective limit is per worker; that is enough to take
+# the hashing cost out of a brute-force burst without a shared store.
+class FailedLoginLimiter:
+    def __init__(self, max_user_failures=MAX_USER_FAILURES, max_ip_failures=MAX_IP_FAILURES,
+                 window=WINDOW, max_keys=MAX_KEYS, clock=time.monotonic):
+        self.limits = {'user': max_user_failures, 'ip': max_ip_failures}
+        self.window = window
+        self.max_keys = max_keys
+        self.clock = clock
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _keys(self, username, ip):
+        keys = [('user', (username or '').strip().lower())]
+        if ip and self.limits['ip'] > 0:
+            keys.append(('ip', ip))
+        return keys
+
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    # Seconds until the caller may try again, or 0 if the attempt may proceed.
+    def retry_after(self, username, ip):
+        now = self.clock()
+        wait = 0
+        with self._lock:
+            for key in self._keys(username, ip):
+                failures = self._recent(key, now)
+                if failures and len(failures) >= self.limits[key[0]]:
+                    wait = max(wait, failures[-self.limits[key[0]]] + self.window - now)
+        return wait
+
+    def record_failure(self, username, ip):
+        now = self.clock()
+        with self._lock:
+            for key in self._keys(username, ip):
+                failures = self._recent(key, now)
+                if failures is None:
+                    failures = self._failures[key] = deque()
+                failures.append(now)
+                self._failures.move_to_end(key)
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+
+    # A successful login clears the username's failures but not the IP's, so
+    # one valid account cannot be used to reset a spraying client's budget.
+    def reset(self, username):
+        with self._lock:
+            self._failures.pop(('user', (username or '').strip().lower()), None)
+
+
+def client_ip(request, trusted_hops=TRUSTED_PROXY_HOPS):
+    remote = request.META.get('REMOTE_ADDR', '')
+    if trusted_hops <= 0:
+        return remote
+    forwarded = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    if len(forwarded) < trusted_hops:
+        return remote  # the request did not come through every proxy
+    return forwarded[-trusted_hops]
+
+
+login_limiter = FailedLoginLimiter()
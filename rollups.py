@@ -0,0 +1,175 @@
+from pymongo.errors import DuplicateKeyError
+
+from .aggregates import CATEGORIES, DEFAULT_WINDOW, sum_fields
+from .models import Entry, DetailedEntry
+
+# Each user has one rollup document holding all-time totals, the newest
+# ROLLUP_WINDOW rows of each entry kind and all-time per-category sums. The
+# entry forms and bulk imports update it in place with $inc/$push, so the
+# dashboards read one document instead of scanning entries.
+ROLLUP_WINDOW = DEFAULT_WINDOW
+BUDGET_FIELDS = [f'budget_{key}' for key, _, _ in CATEGORIES]
+EXPENSE_FIELDS = [f'expense_{key}' for key, _, _ in CATEGORIES]
+
+
+def rollups_collection():
+    return Entry._get_collection().database['rollups']
+
+
+def entry_row(entry):
+    return {
+        'date': entry.date,
+        'label': entry.date.strftime('%m/%d'),
+        'salary': float(entry.salary),
+        'budget': float(entry.budget),
+        'expenses': float(entry.expenses),
+    }
+
+
+def detailed_row(entry):
+    row = {
+        'date': entry.date,
+        'label': entry.date.strftime('%m/%d'),
+        'salary': float(entry.salary),
+    }
+    for field in BUDGET_FIELDS + EXPENSE_FIELDS:
+        row[field] = float(getattr(entry, field))
+    row['total_budget'] = sum(row[field] for field in BUDGET_FIELDS)
+    row['total_expenses'] = sum(row[field] for field in EXPENSE_FIELDS)
+    return row
+
+
+def _push_recent(field, rows):
+    # Kept newest first and trimmed to the window in the same update. Sorting
+    # on date (rather than prepending) keeps backdated imports in place.
+    return {field: {'$each': rows, '$sort': {'date': -1}, '$slice': ROLLUP_WINDOW}}
+
+
+def _entry_update(rows):
+    return {
+        '$inc': {
+            'entries.count': len(rows),
+            'entries.salary': sum(row['salary'] for row in rows),
+            'entries.budget': sum(row['budget'] for row in rows),
+            'entries.expenses': sum(row['expenses'] for row in rows),
+        },
+        '$push': _push_recent('entries.recent', rows),
+    }
+
+
+def _detailed_update(rows):
+    inc = {'detailed.count': len(rows)}
+    for field in ['salary', 'total_budget', 'total_expenses'] + BUDGET_FIELDS + EXPENSE_FIELDS:
+        inc[f'detailed.{field}'] = sum(row[field] for row in rows)
+    return {
+        '$inc': inc,
+        '$push': _push_recent('detailed.recent', rows),
+    }
+
+
+def _apply(user_id, update):
+    # Writers call ensure_rollup before saving, so the document is normally
+    # there. If it has gone missing since, seeding from the entries (which
+    # already include the new ones) replaces the increment.
+    if rollups_collection().update_one({'_id': user_id}, update).matched_count == 0:
+        ensure_rollup(user_id)
+
+
+def record_entries(user_id, entries):
+    if entries:
+        _apply(user_id, _entry_update([entry_row(entry) for entry in entries]))
+
+
+def record_detailed_entries(user_id, entries):
+    if entries:
+        _apply(user_id, _detailed_update([detailed_row(entry) for entry in entries]))
+
+
+def _totals_pipeline(user_id, fields, extra_stages=()):
+    group = {'_id': None, 'count': {'$sum': 1}}
+    for field in fields:
+        group[field] = {'$sum': f'${field}'}
+    return [{'$match': {'user_id': user_id}}, *extra_stages, {'$group': group}]
+
+
+def _snapshot(user_id):
+    entry_pipeline = _totals_pipeline(user_id, ['salary', 'budget', 'expenses'])
+    detailed_pipeline = _totals_pipeline(
+        user_id,
+        ['salary', 'total_budget', 'total_expenses'] + BUDGET_FIELDS + EXPENSE_FIELDS,
+        [{'$addFields': {'total_budget': sum_fields(BUDGET_FIELDS), 'total_expenses': sum_fields(EXPENSE_FIELDS)}}]
+    )
+
+    entries = next(Entry._get_collection().aggregate(entry_pipeline), {'count': 0})
+    detailed = next(DetailedEntry._get_collection().aggregate(detailed_pipeline), {'count': 0})
+    entries.pop('_id', None)
+    detailed.pop('_id', None)
+    entries = {field: float(value) for field, value in entries.items()}
+    detailed = {field: float(value) for field, value in detailed.items()}
+    entries['count'] = int(entries.get('count', 0))
+    detailed['count'] = int(detailed.get('count', 0))
+
+    entries['recent'] = [
+        entry_row(entry)
+        for entry in Entry.objects(user_id=user_id).order_by('-date', '-id').limit(ROLLUP_WINDOW)
+    ]
+    detailed['recent'] = [
+        detailed_row(entry)
+        for entry in DetailedEntry.objects(user_id=user_id).order_by('-date', '-id').limit(ROLLUP_WINDOW)
+    ]
+    return {'entries': entries, 'detailed': detailed}
+
+
+# Seeds a user's rollup from their entries if it does not exist yet, and
+# never overwrites one that does: an existing rollup may already hold
+# increments a fresh snapshot would miss. Writers call this *before* saving
+# new entries and then $inc them in, so every entry is counted exactly once
+# whichever seed wins.
+def ensure_rollup(user_id):
+    rollup = rollups_collection().find_one({'_id': user_id})
+    if rollup is not None:
+        return rollup
+    try:
+        rollups_collection().update_one({'_id': user_id}, {'$setOnInsert': _snapshot(user_id)}, upsert=True)
+    except DuplicateKeyError:
+        pass  # another request seeded it first
+    return rollups_collection().find_one({'_id': user_id})
+
+
+# The dashboards' window summaries, served from the rollup when the window
+# is the newest N <= ROLLUP_WINDOW entries. Returns None for any other window
+# so the caller falls back to the aggregation.
+def entry_window_summary(rollup, window):
+    if window.get('last', ROLLUP_WINDOW + 1) > ROLLUP_WINDOW:
+        return None
+    rows = rollup['entries']['recent'][:window['last']]
+    return {
+        'count': len(rows),
+        'total_salary': sum(row['salary'] for row in rows),
+        'total_budget': sum(row['budget'] for row in rows),
+        'total_expenses': sum(row['expenses'] for row in rows),
+        'rows': rows,
+    }
+
+
+def detailed_window_summary(rollup, window):
+    if window.get('last', ROLLUP_WINDOW + 1) > ROLLUP_WINDOW:
+        return None
+    rows = rollup['detailed']['recent'][:window['last']]
+    categories = [
+        {
+            'name': name,
+            'budget': sum(row[f'budget_{key}'] for row in rows),
+            'expense': sum(row[f'expense_{key}'] for row in rows),
+            'icon': icon,
+        }
+        for key, name, icon in CATEGORIES
+    ]
+    return {
+        'count': len(rows),
+        'total_salary': sum(row['salary'] for row in rows),
+        'total_budget': sum(row['total_budget'] for row in rows),
+        'total_expenses': sum(row['total_expenses'] for row in rows),
+        'categories': categories,
+        'rows': rows,
+    }
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+# SM-2 defaults. Quality is graded 0-5; anything below PASSING_QUALITY
+# resets the card to the start of its schedule.
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+PASSING_QUALITY = 3
+CORRECT_QUALITY = 4
+INCORRECT_QUALITY = 1
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def new_review_state(now=None):
+    return {
+        "ease": DEFAULT_EASE,
+        "interval": 0,
+        "repetitions": 0,
+        "due": now or utcnow()
+    }
+
+
+def quality_for(correct):
+    return CORRECT_QUALITY if correct else INCORRECT_QUALITY
+
+
+def next_review_state(state, quality, now=None):
+    now = now or utcnow()
+    state = state or new_review_state(now)
+    ease = state.get("ease", DEFAULT_EASE)
+    interval = state.get("interval", 0)
+    repetitions = state.get("repetitions", 0)
+
+    if quality < PASSING_QUALITY:
+        repetitions = 0
+        interval = 1
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval = 1
+        elif repetitions == 2:
+            interval = 6
+        else:
+            interval = max(1, round(interval * ease))
+
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    return {
+        "ease": round(ease, 4),
+        "interval": interval,
+        "repetitions": repetitions,
+        "due": now + timedelta(days=interval)
+    }
+
+
+def serialize_review_state(state):
+    return {
+        "ease": state["ease"],
+        "interval": state["interval"],
+        "repetitions": state["repetitions"],
+        "due": state["due"].isoformat() + "Z"
+    }
@@ -0,0 +1,208 @@
+import heapq
+import math
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict, defaultdict
+
+from matching import normalize
+
+FIELD_WEIGHTS = {"question": 3.0, "answer": 2.0, "hint": 1.0}
+PREFIX_WEIGHT = 0.5
+MAX_PREFIX_TERMS = 64
+
+
+def tokenize(text):
+    return normalize(text).split() if isinstance(text, str) else []
+
+
+# Inverted index over question/answer/hint. Every query token but the last
+# must match a whole term; the last one is matched as a prefix so results
+# update while the user types. Prefix lookup is a bisect into the sorted
+# term list, so it never walks the whole vocabulary.
+class SearchIndex:
+    def __init__(self, loader, version_source=None, check_interval=1.0, change_source=None, card_loader=None):
+        self.loader = loader
+        self.version_source = version_source
+        self.check_interval = check_interval
+        self.change_source = change_source
+        self.card_loader = card_loader
+        self._lock = threading.RLock()
+        self._postings = None
+        self._terms = []
+        self._forward = {}
+        self._version = None
+        self._checked_at = 0
+
+    def _card_terms(self, card):
+        weights = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(card.get(field)):
+                weights[term] += weight
+        return weights
+
+    def _add(self, card_id, card, keep_sorted=True):
+        self._remove(card_id)
+        weights = self._card_terms(card)
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                if keep_sorted:
+                    insort(self._terms, term)
+            postings[card_id] = weight
+        self._forward[card_id] = list(weights)
+
+    def _remove(self, card_id):
+        for term in self._forward.pop(card_id, ()):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(card_id, None)
+            if not postings:
+                del self._postings[term]
+                index = bisect_left(self._terms, term)
+                if index < len(self._terms) and self._terms[index] == term:
+                    del self._terms[index]
+
+    def _build(self):
+        self._postings = {}
+        self._terms = []
+        self._forward = {}
+        version = self.version_source() if self.version_source else None
+        for card in self.loader():
+            self._add(card["_id"], card, keep_sorted=False)
+        # One sort over the vocabulary instead of an insort per new term.
+        self._terms = sorted(self._postings)
+        self._version = version
+        self._checked_at = time.monotonic()
+
+    def _catch_up(self):
+        # Re-index only the cards the log says changed since our version.
+        # Whatever those cards look like now is what gets indexed, so a card
+        # that changed again since is simply picked up early.
+        version, changes = self.change_source(self._version)
+        if version == self._version:
+            return
+        if changes is None:
+            self._build()
+            return
+        touched = {card_id for change in changes for card_id in change["added"] + change["removed"]}
+        for card_id in touched:
+            self._remove(card_id)
+        if touched:
+            for card in self.card_loader(list(touched)):
+                self._add(card["_id"], card)
+        self._version = version
+
+    def _ensure_fresh(self):
+        if self._postings is None:
+            self._build()
+            return
+        if self.version_source is None:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if self.change_source is not None and self._version is not None:
+            self._catch_up()
+        elif self.version_source() != self._version:
+            self._build()
+
+    def apply(self, version, added=(), removed=()):
+        # Incremental update for a local write. If another worker wrote in
+        # between (the version skipped), the next search catches up on both
+        # writes from the change log (or rebuilds, without one).
+        with self._lock:
+            if self._postings is None:
+                return
+            if version is not None and self._version is not None and version != self._version + 1:
+                if self.change_source is None:
+                    self._postings = None
+                self._checked_at = 0
+                return
+            for card_id in removed:
+                self._remove(card_id)
+            for card in added:
+                self._add(card["_id"], card)
+            if version is not None:
+                self._version = version
+
+    def _prefix_terms(self, prefix):
+        start = bisect_left(self._terms, prefix)
+        terms = []
+        for term in self._terms[start:start + MAX_PREFIX_TERMS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def search(self, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            self._ensure_fresh()
+            total = max(1, len(self._forward))
+            scores = None
+            for position, token in enumerate(tokens):
+                if position == len(tokens) - 1:
+                    matches = [(t, 1.0 if t == token else PREFIX_WEIGHT) for t in self._prefix_terms(token)]
+                else:
+                    matches = [(token, 1.0)] if token in self._postings else []
+
+                token_scores = defaultdict(float)
+                for term, factor in matches:
+                    postings = self._postings[term]
+                    idf = math.log(1 + total / len(postings))
+                    for card_id, weight in postings.items():
+                        token_scores[card_id] = max(token_scores[card_id], weight * idf * factor)
+
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {card_id: s + token_scores[card_id] for card_id, s in scores.items() if card_id in token_scores}
+                if not scores:
+                    return []
+            return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+# One SearchIndex per user, so a query only ever walks that user's postings.
+# The least recently searched indexes are dropped past max_users and rebuilt
+# on demand.
+class UserSearchIndexes:
+    def __init__(self, loader, version_source=None, check_interval=1.0, max_users=1000, change_source=None, card_loader=None):
+        self.loader = loader
+        self.version_source = version_source
+        self.check_interval = check_interval
+        self.change_source = change_source
+        self.card_loader = card_loader
+        self.max_users = max_users
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                index = self._indexes[user_id] = SearchIndex(
+                    loader=lambda: self.loader(user_id),
+                    version_source=(lambda: self.version_source(user_id)) if self.version_source else None,
+                    check_interval=self.check_interval,
+                    change_source=(lambda version: self.change_source(user_id, version)) if self.change_source else None,
+                    card_loader=(lambda ids: self.card_loader(user_id, ids)) if self.card_loader else None
+                )
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+            return index
+
+    def apply(self, user_id, version, added=(), removed=()):
+        with self._lock:
+            index = self._indexes.get(user_id)
+        if index is not None:
+            index.apply(version, added=added, removed=removed)
+
+    def search(self, user_id, query, limit):
+        return self.get(user_id).search(query, limit)
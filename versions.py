@@ -0,0 +1,64 @@
+from pymongo import ReturnDocument
+
+from db import LazyCollection
+
+# One counter document per logical collection. Writers bump it; readers
+# compare it to decide whether anything they hold is stale.
+meta_col = LazyCollection("meta")
+
+# The counter document also keeps what the last CHANGE_LOG_SIZE bumps
+# changed, newest last, so a reader a few versions behind can catch up on
+# just those documents. Every bump pushes exactly one entry (None when the
+# writer did not say, or the change is too big to log) in the same update
+# as the $inc, so the last entry always belongs to the current version.
+CHANGE_LOG_SIZE = 64
+MAX_LOGGED_IDS = 1000
+
+
+def bump_update(added=(), removed=(), logged=True):
+    ids = len(added) + len(removed)
+    change = {"added": list(added), "removed": list(removed)} if logged and ids <= MAX_LOGGED_IDS else None
+    return {
+        "$inc": {"version": 1},
+        "$currentDate": {"updated_at": True},
+        "$push": {"changes": {"$each": [change], "$slice": -CHANGE_LOG_SIZE}}
+    }
+
+
+def bump_version(name, added=(), removed=(), logged=True):
+    doc = meta_col.find_one_and_update(
+        {"_id": name},
+        bump_update(added, removed, logged),
+        projection={"version": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
+
+
+def current_version(name):
+    doc = meta_col.find_one({"_id": name}, {"version": 1})
+    return doc["version"] if doc else 0
+
+
+# The ids changed since `version`, oldest first, as (current version, changes).
+# changes is None when the log does not reach back that far or a bump in
+# between was not logged; the caller has to reload everything then.
+def changes_since(name, version):
+    doc = meta_col.find_one({"_id": name}, {"version": 1, "changes": 1})
+    current = doc["version"] if doc else 0
+    log = doc.get("changes", []) if doc else []
+    behind = current - version
+    if behind < 0 or behind > len(log):
+        return current, None
+    pending = log[len(log) - behind:] if behind else []
+    if any(change is None for change in pending):
+        return current, None
+    return current, pending
+
+
+def version_info(*names):
+    docs = {doc["_id"]: doc for doc in meta_col.find({"_id": {"$in": list(names)}}, {"version": 1, "updated_at": 1})}
+    versions = [docs.get(name, {}).get("version", 0) for name in names]
+    timestamps = [docs[name]["updated_at"] for name in names if "updated_at" in docs.get(name, {})]
+    return versions, max(timestamps) if timestamps else None
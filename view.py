@@ -1,11 +1,23 @@
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError, transaction
 from .models import Entry, DetailedEntry
+from .aggregates import parse_window, entry_summary, detailed_summary
+from .rollups import (
+    ensure_rollup, record_entries, record_detailed_entries, entry_window_summary,
+    detailed_window_summary
+)
+from .alerts import build_snapshot, evaluate
+from .ingest import ENTRY_AMOUNTS, DETAILED_AMOUNTS, read_rows, validate_rows, insert_rows
+from .ratelimit import client_ip, login_limiter
+from .entry_history import ENTRY_FIELDS, DETAILED_FIELDS, history_page, parse_limit, export_lines
 from datetime import datetime
 from decimal import Decimal
+import csv
 
 # Register view
 def register(request):
@@ -13,11 +25,14 @@ def register(request):
         username = request.POST['username']
         password = request.POST['password']
 
-        if User.objects.filter(username=username).exists():
+        # The unique username constraint settles duplicates (and concurrent
+        # sign-ups) in the INSERT itself, so no existence check is needed.
+        try:
+            with transaction.atomic():
+                User.objects.create_user(username=username, password=password)
+        except IntegrityError:
             messages.error(request, 'Username already exists')
         else:
-            user = User.objects.create_user(username=username, password=password)
-            user.save()
             messages.success(request, 'Registration successful. Please log in.')
             return redirect('login')
     return render(request, 'tracker/register.html')
@@ -28,12 +43,22 @@ def login_view(request):
     if request.method == 'POST':
         username = request.POST['username']
         password = request.POST['password']
+        ip = client_ip(request)
+
+        # Refuse throttled usernames/IPs before authenticate spends time hashing
+        wait = login_limiter.retry_after(username, ip)
+        if wait:
+            messages.error(request, f'Too many failed attempts. Try again in {int(wait) + 1} seconds.')
+            return render(request, 'tracker/login.html', status=429)
+
         user = authenticate(username=username, password=password)
 
         if user:
+            login_limiter.reset(username)
             login(request, user)
             return redirect('dashboard')
         else:
+            login_limiter.record_failure(username, ip)
             messages.error(request, 'Invalid username or password')
     return render(request, 'tracker/login.html')
 
@@ -48,23 +73,16 @@ def logout_view(request):
 # Dashboard view
 @login_required
 def dashboard(request):
-    user_entries = Entry.objects(user_id=request.user.id).order_by('-date')[:10]  # Last 10 entries
-    total_salary = sum(entry.salary for entry in user_entries)
-    total_budget = sum(entry.budget for entry in user_entries)
-    total_expenses = sum(entry.expenses for entry in user_entries)
+    window = parse_window(request)
+    rollup = ensure_rollup(request.user.id)
+    summary = entry_window_summary(rollup, window) or entry_summary(request.user.id, window)
+    user_entries = summary['rows']
 
     # Smart Alert System
-    alerts = []
+    snapshot = build_snapshot(summary, entry_count=rollup['entries']['count'])
+    alerts = evaluate(snapshot)
 
-    # Welcome alert for new users
     if len(user_entries) == 0:
-        alerts.append({
-            'type': 'info',
-            'icon': '🎯',
-            'title': 'Welcome to Your Finance Tracker!',
-            'message': 'Start your financial journey by adding your first entry',
-            'action': 'Click "Add Entry" to begin tracking your budget and expenses.'
-        })
         return render(request, 'tracker/dashboard.html', {
             'total_salary': 0,
             'total_budget': 0,
@@ -75,177 +93,22 @@ def dashboard(request):
             'chart_expenses_data': [],
             'avg_budget': 0,
             'avg_expenses': 0,
-            'entries': []
-        })
-
-    # Basic budget alert
-    if total_expenses > total_budget:
-        overspend_amount = total_expenses - total_budget
-        overspend_percentage = (overspend_amount / total_budget * 100) if total_budget > 0 else 0
-        alerts.append({
-            'type': 'danger',
-            'icon': '🚨',
-            'title': 'Budget Exceeded!',
-            'message': f'You\'ve overspent by ${overspend_amount:.2f} ({overspend_percentage:.1f}% over budget)',
-            'action': 'Review your recent expenses and consider adjusting your spending habits.'
-        })
-
-    # Prepare data for chart
-    chart_labels = []
-    chart_budget_data = []
-    chart_expenses_data = []
-
-    for entry in user_entries:
-        chart_labels.append(entry.date.strftime('%m/%d'))
-        chart_budget_data.append(float(entry.budget))
-        chart_expenses_data.append(float(entry.expenses))
-
-    # Calculate averages and trends
-    avg_budget = sum(chart_budget_data) / len(chart_budget_data) if chart_budget_data else 0
-    avg_expenses = sum(chart_expenses_data) / len(chart_expenses_data) if chart_expenses_data else 0
-
-    # Advanced Smart Alerts
-    if len(user_entries) >= 3:
-        recent_entries = list(user_entries[:3])
-
-        # Trend analysis
-        recent_expenses = [float(entry.expenses) for entry in recent_entries]
-        if len(recent_expenses) >= 2:
-            expense_trend = recent_expenses[0] - recent_expenses[-1]
-
-            if expense_trend > 0:
-                alerts.append({
-                    'type': 'warning',
-                    'icon': '📈',
-                    'title': 'Rising Expenses Trend',
-                    'message': f'Your expenses have increased by ${expense_trend:.2f} in recent entries',
-                    'action': 'Consider reviewing your spending categories to identify areas for reduction.'
-                })
-            elif expense_trend < -50:  # Significant decrease
-                alerts.append({
-                    'type': 'success',
-                    'icon': '📉',
-                    'title': 'Great Progress!',
-                    'message': f'You\'ve reduced expenses by ${abs(expense_trend):.2f} recently',
-                    'action': 'Keep up the excellent financial discipline!'
-                })
-
-        # High expense ratio alert
-        if avg_expenses > 0 and avg_budget > 0:
-            expense_ratio = (avg_expenses / avg_budget) * 100
-            if expense_ratio > 90:
-                alerts.append({
-                    'type': 'warning',
-                    'icon': '⚠',
-                    'title': 'High Expense Ratio',
-                    'message': f'You\'re using {expense_ratio:.1f}% of your budget on average',
-                    'action': 'Consider increasing your budget or finding ways to reduce expenses.'
-                })
-            elif expense_ratio < 70:
-                alerts.append({
-                    'type': 'info',
-                    'icon': '💡',
-                    'title': 'Budget Opportunity',
-                    'message': f'You\'re only using {expense_ratio:.1f}% of your budget',
-                    'action': 'Great job! Consider saving the extra or investing in your future.'
-                })
-
-    # Savings potential alert
-    if total_budget > total_expenses and total_budget > 0:
-        savings_amount = total_budget - total_expenses
-        savings_percentage = (savings_amount / total_budget) * 100
-        if savings_percentage > 20:
-            alerts.append({
-                'type': 'success',
-                'icon': '💰',
-                'title': 'Excellent Savings!',
-                'message': f'You\'ve saved ${savings_amount:.2f} ({savings_percentage:.1f}% of budget)',
-                'action': 'Consider investing these savings or building an emergency fund.'
-            })
-
-    # Low budget alert
-    if len(user_entries) > 0 and avg_budget < avg_expenses * 0.8:
-        alerts.append({
-            'type': 'info',
-            'icon': '📊',
-            'title': 'Budget Review Needed',
-            'message': 'Your budget might be too low for your spending patterns',
-            'action': 'Consider reviewing and adjusting your budget to be more realistic.'
+            'entries': [],
+            'window': window
         })
 
-    # Spending spike detection
-    if len(user_entries) >= 5:
-        recent_5_expenses = [float(entry.expenses) for entry in user_entries[:5]]
-        if len(recent_5_expenses) >= 2:
-            latest_expense = recent_5_expenses[0]
-            avg_previous_4 = sum(recent_5_expenses[1:]) / 4
-
-            if latest_expense > avg_previous_4 * 1.5:  # 50% spike
-                spike_amount = latest_expense - avg_previous_4
-                alerts.append({
-                    'type': 'warning',
-                    'icon': '📊',
-                    'title': 'Spending Spike Detected',
-                    'message': f'Your latest expense (${latest_expense:.2f}) is ${spike_amount:.2f} higher than your recent average',
-                    'action': 'Review what caused this increase and consider if it was planned or if you need to adjust future spending.'
-                })
-
-    # Consistent saver recognition
-    if len(user_entries) >= 4:
-        last_4_entries = list(user_entries[:4])
-        consistent_savings = all(entry.budget > entry.expenses for entry in last_4_entries)
-
-        if consistent_savings:
-            alerts.append({
-                'type': 'success',
-                'icon': '🌟',
-                'title': 'Consistent Saver!',
-                'message': 'You\'ve stayed under budget for your last 4 entries',
-                'action': 'Amazing discipline! Consider setting up automatic savings for your surplus.'
-            })
-
-    # Monthly milestone alert (if user has been tracking for a while)
-    if len(user_entries) >= 10:
-        alerts.append({
-            'type': 'info',
-            'icon': '🏆',
-            'title': 'Tracking Milestone',
-            'message': f'You\'ve made {len(user_entries)} financial entries - great commitment to tracking!',
-            'action': 'Consider reviewing your long-term trends and setting new financial goals.'
-        })
-
-    # Smart financial tip based on patterns
-    if len(user_entries) >= 3 and avg_budget > 0 and avg_expenses > 0:
-        expense_ratio = (avg_expenses / avg_budget) * 100
-
-        if 80 <= expense_ratio <= 90:
-            alerts.append({
-                'type': 'info',
-                'icon': '💡',
-                'title': 'Smart Tip: Emergency Fund',
-                'message': f'You\'re using {expense_ratio:.1f}% of your budget consistently',
-                'action': 'Consider building an emergency fund with your remaining 10-20% budget surplus.'
-            })
-        elif expense_ratio < 60:
-            alerts.append({
-                'type': 'success',
-                'icon': '💡',
-                'title': 'Smart Tip: Investment Opportunity',
-                'message': f'You\'re only using {expense_ratio:.1f}% of your budget',
-                'action': 'Great savings rate! Consider investing the surplus in index funds or retirement accounts.'
-            })
-
     context = {
-        'total_salary': total_salary,
-        'total_budget': total_budget,
-        'total_expenses': total_expenses,
+        'total_salary': summary['total_salary'],
+        'total_budget': summary['total_budget'],
+        'total_expenses': summary['total_expenses'],
         'alerts': alerts,
-        'chart_labels': chart_labels,
-        'chart_budget_data': chart_budget_data,
-        'chart_expenses_data': chart_expenses_data,
-        'avg_budget': avg_budget,
-        'avg_expenses': avg_expenses,
-        'entries': user_entries
+        'chart_labels': [entry['label'] for entry in user_entries],
+        'chart_budget_data': [entry['budget'] for entry in user_entries],
+        'chart_expenses_data': [entry['expenses'] for entry in user_entries],
+        'avg_budget': snapshot['avg_budget'],
+        'avg_expenses': snapshot['avg_expenses'],
+        'entries': user_entries,
+        'window': window
     }
     return render(request, 'tracker/dashboard.html', context)
 
@@ -258,7 +121,8 @@ def entry_form(request):
         budget = Decimal(request.POST['budget'])
         expenses = Decimal(request.POST['expenses'])
 
-        Entry(
+        ensure_rollup(request.user.id)  # seed before saving so the entry is counted once
+        entry = Entry(
             user_id=request.user.id,
             username=request.user.username,
             salary=salary,
@@ -266,16 +130,62 @@ def entry_form(request):
             expenses=expenses,
             date=datetime.now()
         ).save()
+        record_entries(request.user.id, [entry])
         messages.success(request, 'Entry added successfully!')
         return redirect('dashboard')
     return render(request, 'tracker/entry_form.html')
 
 
+# Bulk entry import view
+@login_required
+def bulk_entries(request):
+    return _bulk_import(request, Entry, ENTRY_AMOUNTS, ENTRY_AMOUNTS, record_entries)
+
+
+# Bulk detailed entry import view
+@login_required
+def bulk_detailed_entries(request):
+    return _bulk_import(request, DetailedEntry, DETAILED_AMOUNTS, (), record_detailed_entries)
+
+
+def _bulk_import(request, model, amount_fields, required, on_batch):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST a CSV, JSON or NDJSON upload'}, status=405)
+
+    upload = request.FILES.get('file')
+    name = upload.name if upload else ''
+    fmt = request.GET.get('format') or (name.rsplit('.', 1)[-1].lower() if '.' in name else 'csv')
+    try:
+        data = (upload.read() if upload else request.body).decode('utf-8-sig')
+        rows = read_rows(data, fmt)
+    except (UnicodeDecodeError, ValueError, csv.Error) as e:
+        # csv.Error covers malformed CSV, e.g. a field over csv's size limit.
+        return JsonResponse({'error': f'Could not read upload: {e}'}, status=400)
+
+    clean, errors = validate_rows(rows, amount_fields, required)
+    ensure_rollup(request.user.id)
+    inserted, insert_errors = insert_rows(model, request.user, clean, on_batch)
+    errors.extend(insert_errors)
+    return JsonResponse({
+        'received': len(rows),
+        'inserted': inserted,
+        'errors': sorted(errors, key=lambda error: error['row'])
+    }, status=201 if inserted else 400)
+
+
 # History view
 @login_required
 def history(request):
-    entries = Entry.objects(user_id=request.user.id).order_by('-date')
-    return render(request, 'tracker/history.html', {'entries': entries})
+    entries, next_cursor = history_page(
+        Entry, request.user.id, request.GET.get('after'), parse_limit(request)
+    )
+    return render(request, 'tracker/history.html', {'entries': entries, 'next_cursor': next_cursor})
+
+
+# History export view
+@login_required
+def history_export(request):
+    return _export_response(request, Entry, ENTRY_FIELDS, 'history')
 
 
 # Detailed Entry form view
@@ -304,7 +214,8 @@ def detailed_entry_form(request):
         expense_others = Decimal(request.POST.get('expense_others', 0))
 
         # Create detailed entry
-        DetailedEntry(
+        ensure_rollup(request.user.id)  # seed before saving so the entry is counted once
+        entry = DetailedEntry(
             user_id=request.user.id,
             username=request.user.username,
             salary=salary,
@@ -324,6 +235,7 @@ def detailed_entry_form(request):
             expense_others=expense_others,
             date=datetime.now()
         ).save()
+        record_detailed_entries(request.user.id, [entry])
 
         messages.success(request, 'Detailed entry added successfully!')
         return redirect('detailed_dashboard')
@@ -334,55 +246,36 @@ def detailed_entry_form(request):
 # Detailed Dashboard view
 @login_required
 def detailed_dashboard(request):
-    user_entries = DetailedEntry.objects(user_id=request.user.id).order_by('-date')[:10]
-    print(f"DEBUG: User={request.user.username}, Entries found={len(user_entries)}")
+    window = parse_window(request)
+    summary = detailed_window_summary(ensure_rollup(request.user.id), window) or detailed_summary(request.user.id, window)
+    user_entries = summary['rows']
 
-    if len(user_entries) == 0:
+    if summary['count'] == 0:
         return render(request, 'tracker/detailed_dashboard.html', {
             'total_salary': 0,
             'total_budget': 0,
             'total_expenses': 0,
             'categories': [],
             'chart_data': {},
-            'entries': []
+            'entries': [],
+            'window': window
         })
 
-    # Calculate totals
-    total_salary = sum(entry.salary for entry in user_entries)
-    total_budget = sum(entry.total_budget for entry in user_entries)
-    total_expenses = sum(entry.total_expenses for entry in user_entries)
-
-    # Prepare category data for charts
-    categories = ['Education', 'Entertainment', 'Housing', 'Transport', 'Food', 'Utilities', 'Others']
-    category_budget_totals = []
-    category_expense_totals = []
-    category_data = []
-
-    category_mapping = ['education', 'entertainment', 'housing', 'transport', 'food', 'utilities', 'others']
-
-    for i, category in enumerate(category_mapping):
-        budget_total = sum(getattr(entry, f'budget_{category}') for entry in user_entries)
-        expense_total = sum(getattr(entry, f'expense_{category}') for entry in user_entries)
-        category_budget_totals.append(float(budget_total))
-        category_expense_totals.append(float(expense_total))
-
-        # Create structured data for template
-        category_data.append({
-            'name': categories[i],
-            'budget': float(budget_total),
-            'expense': float(expense_total),
-            'icon': ['🎓', '🎬', '🏠', '🚗', '🍽', '⚡', '📦'][i]
-        })
+    # Category data for charts comes pre-summed from the rollup or pipeline
+    category_data = summary['categories']
+    categories = [category['name'] for category in category_data]
+    category_budget_totals = [category['budget'] for category in category_data]
+    category_expense_totals = [category['expense'] for category in category_data]
 
     # Prepare timeline data
-    chart_labels = [entry.date.strftime('%m/%d') for entry in user_entries]
-    chart_budget_data = [float(entry.total_budget) for entry in user_entries]
-    chart_expenses_data = [float(entry.total_expenses) for entry in user_entries]
+    chart_labels = [entry['label'] for entry in user_entries]
+    chart_budget_data = [entry['total_budget'] for entry in user_entries]
+    chart_expenses_data = [entry['total_expenses'] for entry in user_entries]
 
     context = {
-        'total_salary': total_salary,
-        'total_budget': total_budget,
-        'total_expenses': total_expenses,
+        'total_salary': summary['total_salary'],
+        'total_budget': summary['total_budget'],
+        'total_expenses': summary['total_expenses'],
         'categories': categories,
         'category_data': category_data,
         'category_budget_totals': category_budget_totals,
@@ -390,7 +283,8 @@ def detailed_dashboard(request):
         'chart_labels': chart_labels,
         'chart_budget_data': chart_budget_data,
         'chart_expenses_data': chart_expenses_data,
-        'entries': user_entries
+        'entries': user_entries,
+        'window': window
     }
 
     return render(request, 'tracker/detailed_dashboard.html', context)
@@ -399,5 +293,21 @@ def detailed_dashboard(request):
 # Detailed History view
 @login_required
 def detailed_history(request):
-    entries = DetailedEntry.objects(user_id=request.user.id).order_by('-date')
-    return render(request, 'tracker/detailed_history.html', {'entries': entries})
+    entries, next_cursor = history_page(
+        DetailedEntry, request.user.id, request.GET.get('after'), parse_limit(request)
+    )
+    return render(request, 'tracker/detailed_history.html', {'entries': entries, 'next_cursor': next_cursor})
+
+
+# Detailed History export view
+@login_required
+def detailed_history_export(request):
+    return _export_response(request, DetailedEntry, DETAILED_FIELDS, 'detailed_history')
+
+
+def _export_response(request, model, fields, name):
+    fmt = 'ndjson' if request.GET.get('format') == 'ndjson' else 'csv'
+    content_type = 'application/x-ndjson' if fmt == 'ndjson' else 'text/csv'
+    response = StreamingHttpResponse(export_lines(model, request.user.id, fields, fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    return response